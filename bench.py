@@ -0,0 +1,481 @@
+"""Offline benchmark and simulation harness for ub.py.
+
+Swaps the module-level `client` of ub.py for an in-process FakeClient and runs
+everything on a virtual clock, so a 500-group cycle with 3-hour breaks
+finishes in seconds without a Telegram account.
+
+Usage:
+    python bench.py --groups 500 --dialogs 5000 --cycles 2
+    python bench.py --json baseline.json
+    python bench.py --compare baseline.json --tolerance 0.25
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import logging
+import tempfile
+import selectors
+import tracemalloc
+import contextlib
+from types import SimpleNamespace
+
+from telethon.errors import FloodWaitError, ChatWriteForbiddenError, SlowModeWaitError
+from telethon.tl.types import InputPeerChannel, Channel, ChatPhotoEmpty, ChatBannedRights
+from telethon.tl.functions.channels import GetChannelsRequest, GetFullChannelRequest
+
+# Selisih latensi (ms) di bawah ini dianggap noise saat --compare
+LATENCY_FLOOR_MS = 5.0
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_MESSAGE = (
+    "<b>PAKET PROMO</b> \U0001f525\nSemua paket resmi dan bergaransi!\n\n"
+    + "".join(f"  ¬ Paket V{i} <b>Rp{50 + i}k</b>\n" for i in range(12))
+    + '<blockquote><a href="https://example.com">Info klik di sini!</a></blockquote>'
+)
+
+
+# Virtual clock
+class VirtualSelector:
+    """Selector wrapper that jumps the loop's clock instead of blocking on timers."""
+
+    def __init__(self):
+        self._selector = selectors.DefaultSelector()
+        self.loop = None
+
+    def select(self, timeout=None):
+        ready = self._selector.select(0)
+        if ready or timeout == 0:
+            return ready
+        if timeout is None:
+            # Tidak ada timer: tunggu pekerjaan executor (self-pipe) secara nyata
+            return self._selector.select(None)
+        self.loop.virtual_time += timeout
+        return []
+
+    def __getattr__(self, name):
+        return getattr(self._selector, name)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """Event loop whose time() is virtual; also records how long each iteration blocks (real time)."""
+
+    def __init__(self):
+        selector = VirtualSelector()
+        super().__init__(selector)
+        selector.loop = self
+        self.virtual_time = 0.0
+        self.iteration_times = []
+
+    def time(self):
+        return self.virtual_time
+
+    def _run_once(self):
+        started = time.perf_counter()
+        super()._run_once()
+        self.iteration_times.append(time.perf_counter() - started)
+
+
+class VirtualTime:
+    """Stand-in for the `time` module inside ub.py, backed by the virtual loop clock."""
+
+    def __init__(self, loop, epoch):
+        self.loop = loop
+        self.epoch = epoch
+
+    def time(self):
+        return self.epoch + self.loop.time()
+
+    def perf_counter(self):
+        return self.loop.time()
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+
+# Fake Telegram objects
+class FakeMessage:
+    def __init__(self, chat_id, msg_id, text=""):
+        self.chat_id = chat_id
+        self.id = msg_id
+        self.message = text
+        self.entities = []
+        self.media = None
+
+
+class FakeDialog:
+    def __init__(self, chat_id, title):
+        self.id = chat_id
+        self.title = title
+        self.is_group = True
+        self.input_entity = InputPeerChannel(-chat_id - 1000000000000, chat_id & 0xFFFF)
+
+
+class FakeEvent:
+    """Minimal NewMessage event for an outgoing command."""
+
+    def __init__(self, client, text, reply=None):
+        self.client = client
+        self.raw_text = text
+        self.chat_id = client.me_id
+        self.id = next(client.msg_ids)
+        self.reply = reply
+        self.reply_to_msg_id = reply.id if reply else None
+        self.pattern_match = None
+
+    async def edit(self, text, **kwargs):
+        await self.client.edit_message(self.chat_id, self.id, text)
+
+    async def respond(self, text=None, **kwargs):
+        return await self.client.send_message(self.chat_id, text or "")
+
+    async def get_reply_message(self):
+        return self.reply
+
+
+class FakeClient:
+    """In-process TelegramClient replacement with configurable latency and injected errors."""
+
+    def __init__(self, latency=0.15, flood_rate=0.0, flood_seconds=30, forbidden=(), slowmode=(), dialogs=()):
+        self.latency = latency
+        self.flood_rate = flood_rate
+        self.flood_seconds = flood_seconds
+        self.forbidden = set(forbidden)
+        self.slowmode = set(slowmode)
+        self.dialogs = list(dialogs)
+        self.rpc = {}
+        self.me_id = 777000
+        self.msg_ids = iter(range(1, 10 ** 9))
+        self.rng = random.Random(1)
+
+    async def _call(self, method):
+        self.rpc[method] = self.rpc.get(method, 0) + 1
+        await asyncio.sleep(self.latency * self.rng.uniform(0.5, 1.5))
+
+    def _inject(self, peer):
+        chat_id = -1000000000000 - peer.channel_id if isinstance(peer, InputPeerChannel) else peer
+        if chat_id in self.forbidden:
+            raise ChatWriteForbiddenError(None)
+        if chat_id in self.slowmode and self.rng.random() < 0.5:
+            raise SlowModeWaitError(None, capture=60)
+        if self.rng.random() < self.flood_rate:
+            raise FloodWaitError(None, capture=self.flood_seconds)
+
+    async def __call__(self, request):
+        """Answer the raw requests ub.py sends directly (group health scan)."""
+        await self._call(type(request).__name__)
+        if isinstance(request, GetChannelsRequest):
+            chats = []
+            for channel in request.id:
+                chat_id = -1000000000000 - channel.channel_id
+                chats.append(Channel(
+                    channel.channel_id, f"Group {chat_id}", ChatPhotoEmpty(), None,
+                    megagroup=True, access_hash=channel.access_hash,
+                    slowmode_enabled=chat_id in self.slowmode,
+                    default_banned_rights=ChatBannedRights(None, send_messages=chat_id in self.forbidden),
+                ))
+            return SimpleNamespace(chats=chats)
+        if isinstance(request, GetFullChannelRequest):
+            return SimpleNamespace(full_chat=SimpleNamespace(slowmode_seconds=60))
+        return SimpleNamespace(chats=[])
+
+    def is_connected(self):
+        return True
+
+    async def get_peer_id(self, peer):
+        return self.me_id
+
+    async def get_input_entity(self, chat_id):
+        await self._call("get_input_entity")
+        return InputPeerChannel(-chat_id - 1000000000000, chat_id & 0xFFFF)
+
+    async def get_entity(self, chat_id):
+        await self._call("get_entity")
+        return FakeDialog(chat_id, f"Group {chat_id}")
+
+    async def get_messages(self, chat_id, ids=None):
+        await self._call("get_messages")
+        return FakeMessage(chat_id, ids)
+
+    async def send_message(self, peer, message="", **kwargs):
+        await self._call("send_message")
+        self._inject(peer)
+        return FakeMessage(peer, next(self.msg_ids), message)
+
+    async def send_file(self, peer, file, **kwargs):
+        await self._call("send_file")
+        self._inject(peer)
+        return FakeMessage(peer, next(self.msg_ids))
+
+    async def forward_messages(self, peer, message):
+        await self._call("forward_messages")
+        self._inject(peer)
+        return FakeMessage(peer, next(self.msg_ids))
+
+    async def edit_message(self, chat_id, msg_id, text=None, **kwargs):
+        await self._call("edit_message")
+
+    def ingest_summary(self):
+        return {"received": 0, "dropped": 0, "saved_seconds": 0.0, "queue_peak": 0, "queue_dropped": 0}
+
+    async def iter_dialogs(self):
+        # GetDialogs mengembalikan 100 dialog per halaman
+        for start in range(0, len(self.dialogs), 100):
+            await self._call("get_dialogs")
+            for dialog in self.dialogs[start:start + 100]:
+                yield dialog
+
+
+# Harness
+def load_ub(workdir):
+    """Import ub.py with its state files and session redirected into `workdir`."""
+    os.environ.setdefault("API_ID", "1")
+    os.environ.setdefault("API_HASH", "bench")
+    os.chdir(workdir)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import ub
+    # main() normally loads the data while connecting; the harness never connects
+    ub.load_data()
+    ub.data_ready.set()
+    logging.getLogger().setLevel(logging.WARNING)
+    return ub
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(values):
+    """p50/p99/max in milliseconds."""
+    return {
+        "p50_ms": round(percentile(values, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(values, 0.99) * 1000, 3),
+        "max_ms": round(max(values, default=0.0) * 1000, 3),
+    }
+
+
+async def run_command(ub, fake, text, latencies):
+    started = time.perf_counter()
+    await ub.route_command(FakeEvent(fake, text))
+    latencies.setdefault(text.split()[0], []).append(time.perf_counter() - started)
+
+
+async def run_broadcast(ub, fake, args):
+    """Run `.start` for N cycles while an operator issues commands; returns the measurements."""
+    loop = asyncio.get_running_loop()
+    cycles = []
+    original_start_break = ub.start_break
+
+    async def counting_start_break(state, progress=None):
+        cycles.append({"virtual_end": loop.time(), "rpc": dict(fake.rpc)})
+        if len(cycles) >= args.cycles:
+            raise asyncio.CancelledError
+        await original_start_break(state, progress)
+
+    ub.start_break = counting_start_break
+    latencies = {}
+    loop.iteration_times.clear()
+    started_real = time.perf_counter()
+    started_virtual = loop.time()
+
+    await run_command(ub, fake, ".start", latencies)
+    while ub.task is not None and not ub.task.done():
+        # Operator mengetik perintah setiap 5 menit (virtual) selama broadcast berjalan
+        await asyncio.sleep(300)
+        for text in (".status", ".jobs", ".grup", ".quarantine", ".pesan"):
+            await run_command(ub, fake, text, latencies)
+    with contextlib.suppress(asyncio.CancelledError):
+        await ub.task
+    ub.start_break = original_start_break
+
+    previous = {}
+    per_cycle = []
+    for cycle in cycles:
+        per_cycle.append({method: count - previous.get(method, 0) for method, count in cycle["rpc"].items()})
+        previous = cycle["rpc"]
+    return {
+        "cycles": len(cycles),
+        "virtual_hours": round((loop.time() - started_virtual) / 3600, 2),
+        "real_seconds": round(time.perf_counter() - started_real, 3),
+        "rpc_per_cycle": per_cycle,
+        "handler_latency": {name: summarize(values) for name, values in latencies.items()},
+        "loop_lag": summarize(loop.iteration_times),
+        "peer_cache": dict(ub.peer_cache_stats),
+    }
+
+
+async def run_dialogs(ub, fake, args):
+    """Measure .grupall / .addgroup against thousands of dialogs and the memory they take."""
+    latencies = {}
+    tracemalloc.start()
+    await run_command(ub, fake, ".grupall refresh", latencies)
+    await run_command(ub, fake, ".grupall", latencies)
+    for _ in range(20):
+        name = random.choice(fake.dialogs).title
+        await run_command(ub, fake, f".addgroup {name[:8]}", latencies)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "dialogs": len(fake.dialogs),
+        "groups": len(ub.group_ids),
+        "handler_latency": {name: summarize(values) for name, values in latencies.items()},
+        "memory_current_kb": current // 1024,
+        "memory_peak_kb": peak // 1024,
+        "rpc": dict(fake.rpc),
+    }
+
+
+async def run_reload(ub, fake, args):
+    """Run one dispatch cycle twice, reloading groups.json a third of the way into the second run."""
+    original_deliver = ub.deliver
+    outcomes = []
+    for reload_after in (None, max(args.groups // 3, 1)):
+        ub.group_stats.clear()
+        ub.quarantine.clear()
+        delivered = 0
+
+        async def counting_deliver(group, payload):
+            nonlocal delivered
+            result = await original_deliver(group, payload)
+            delivered += 1
+            if delivered == reload_after:
+                # Seperti watcher: groups.json dibaca ulang selagi dispatch menunggu jeda berikutnya
+                ub.store.flush_now()
+                asyncio.get_running_loop().call_soon(ub.reload_data, ("groups",))
+            return result
+
+        ub.deliver = counting_deliver
+        state = {"kind": "send", "message_index": 0, "cursor": 0}
+        results = await ub.dispatch({"kind": "template", "index": 0}, ub.group_ids, state)
+        outcomes.append(ub.summarize_results(results))
+    ub.deliver = original_deliver
+    return {"without_reload": outcomes[0], "with_reload": outcomes[1]}
+
+
+def setup_state(ub, fake, args):
+    """Fill ub's state with synthetic groups and one stored message."""
+    group_ids = [-1000000000000 - i for i in range(1, args.groups + 1)]
+    ub.group_ids[:] = [{"id": chat_id, "name": f"Group {i}"} for i, chat_id in enumerate(group_ids, start=1)]
+    ub.reindex()
+    ub.messages[:] = [SAMPLE_MESSAGE]
+    ub.templates[:] = [ub.compile_message(SAMPLE_MESSAGE)]
+    ub.selected_message_index = 0
+    rng = random.Random(2)
+    fake.forbidden = set(rng.sample(group_ids, int(len(group_ids) * args.forbidden_rate)))
+    fake.slowmode = set(rng.sample(group_ids, int(len(group_ids) * args.slowmode_rate)))
+    fake.dialogs = [FakeDialog(-1000000000000 - i, f"Grup Jualan {i:05d}") for i in range(1, args.dialogs + 1)]
+
+
+async def run(args):
+    loop = asyncio.get_running_loop()
+    workdir = tempfile.mkdtemp(prefix="ub-bench-")
+    ub = load_ub(workdir)
+    ub.time = VirtualTime(loop, time.time())
+    random.seed(args.seed)
+
+    fake = FakeClient(latency=args.latency, flood_rate=args.flood_rate)
+    ub.client = fake
+    setup_state(ub, fake, args)
+
+    report = {"config": vars(args).copy()}
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        report["broadcast"] = await run_broadcast(ub, fake, args)
+        fake.rpc.clear()
+        report["dialogs"] = await run_dialogs(ub, fake, args)
+        report["reload"] = await run_reload(ub, fake, args)
+        ub.store.flush_now()
+    report["config"].pop("json", None)
+    report["config"].pop("compare", None)
+    return report
+
+
+def print_report(report):
+    broadcast = report["broadcast"]
+    print(f"Broadcast: {broadcast['cycles']} cycle(s), {broadcast['virtual_hours']}h virtual in {broadcast['real_seconds']}s real")
+    for i, rpc in enumerate(broadcast["rpc_per_cycle"], start=1):
+        print(f"  cycle {i} RPCs: {sum(rpc.values())} {rpc}")
+    print(f"  peer cache: {broadcast['peer_cache']}")
+    print(f"  event-loop lag per iteration: {broadcast['loop_lag']}")
+    for name, stats in broadcast["handler_latency"].items():
+        print(f"  {name:<12} {stats}")
+    dialogs = report["dialogs"]
+    print(f"Dialogs: {dialogs['dialogs']} dialogs, {dialogs['groups']} groups, RPCs {dialogs['rpc']}")
+    print(f"  memory: {dialogs['memory_current_kb']} KB current, {dialogs['memory_peak_kb']} KB peak")
+    for name, stats in dialogs["handler_latency"].items():
+        print(f"  {name:<12} {stats}")
+    reload = report["reload"]
+    print(f"Reload mid-cycle: {reload['with_reload']} (without reload {reload['without_reload']})")
+
+
+def compare(report, baseline, tolerance):
+    """Return regressions where a latency or RPC count grew more than `tolerance` over the baseline."""
+    regressions = []
+
+    def check(label, new, old, floor=0):
+        # floor: selisih absolut minimum agar jitter sub-milidetik tidak dihitung regresi
+        if old and new > old * (1 + tolerance) and new - old > floor:
+            regressions.append(f"{label}: {old} -> {new}")
+
+    for section in ("broadcast", "dialogs"):
+        for name, stats in report[section]["handler_latency"].items():
+            old = baseline.get(section, {}).get("handler_latency", {}).get(name)
+            if old:
+                check(f"{section} {name} p99_ms", stats["p99_ms"], old["p99_ms"], floor=LATENCY_FLOOR_MS)
+    old_cycles = baseline.get("broadcast", {}).get("rpc_per_cycle", [])
+    for i, (new, old) in enumerate(zip(report["broadcast"]["rpc_per_cycle"], old_cycles), start=1):
+        check(f"cycle {i} RPCs", sum(new.values()), sum(old.values()))
+    check("memory_peak_kb", report["dialogs"]["memory_peak_kb"], baseline.get("dialogs", {}).get("memory_peak_kb"))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for ub.py on a virtual clock.")
+    parser.add_argument("--groups", type=int, default=500)
+    parser.add_argument("--dialogs", type=int, default=5000)
+    parser.add_argument("--cycles", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.15, help="mean fake RPC latency (virtual seconds)")
+    parser.add_argument("--flood-rate", type=float, default=0.002)
+    parser.add_argument("--forbidden-rate", type=float, default=0.02)
+    parser.add_argument("--slowmode-rate", type=float, default=0.02)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="baseline report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    loop = VirtualClockLoop()
+    try:
+        report = loop.run_until_complete(run(args))
+    finally:
+        loop.close()
+        os.chdir(cwd)
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=4)
+    # Reload di tengah siklus tidak boleh mengubah hasil kiriman, dengan atau tanpa baseline
+    regressions = []
+    if report["reload"]["with_reload"] != report["reload"]["without_reload"]:
+        regressions.append(f"reload mid-cycle: {report['reload']['without_reload']} -> {report['reload']['with_reload']}")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            regressions += compare(report, json.load(f), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+import os
+import sys
+import glob
+import time
+import ctypes
+import ctypes.util
+import logging
+from telethon.crypto import aes as telethon_aes, libssl
+
+# Ukuran payload khas MTProto: ack/ping, pesan biasa, batch update/dialog besar
+PAYLOAD_SIZES = (256, 4096, 65536)
+# Waktu ukur per ukuran dan arah (detik); minimal satu putaran walau backend lambat
+BENCH_SECONDS = 0.2
+# CRYPTO_BACKEND=auto: ukur semua kandidat sebentar pada payload ini saat startup, lalu pakai yang tercepat
+AUTO_SIZE = 4096
+AUTO_SECONDS = 0.02
+
+# Total AES-IGE yang benar-benar dikerjakan Telethon sejak start (untuk .status)
+crypto_stats = {"calls": 0, "bytes": 0, "seconds": 0.0}
+# Backend yang dipasang oleh install_backend: name -> (encrypt_ige, decrypt_ige), tanpa pembungkus penghitung
+active = {}
+# Fungsi asli Telethon, disimpan sebelum diganti
+telethon_encrypt = telethon_aes.AES.encrypt_ige
+telethon_decrypt = telethon_aes.AES.decrypt_ige
+
+
+def telethon_default():
+    """Name of the backend Telethon picked by itself: cryptg, libssl or pyaes."""
+    if telethon_aes.cryptg is not None:
+        return "cryptg"
+    if libssl.encrypt_ige and libssl.decrypt_ige:
+        return "libssl"
+    return "pyaes"
+
+
+# libcrypto via ctypes: seperti telethon.crypto.libssl, tapi buffer dioper langsung
+# (tanpa menyalin per byte ke array ctypes) dan juga mencari DLL bawaan Python di Windows
+class AES_KEY(ctypes.Structure):
+    _fields_ = [("rd_key", ctypes.c_uint32 * 60), ("rounds", ctypes.c_uint)]
+
+
+def find_libcrypto():
+    names = [ctypes.util.find_library("crypto"), ctypes.util.find_library("ssl")]
+    if sys.platform == "win32":
+        for folder in (os.path.join(sys.base_prefix, "DLLs"), os.path.dirname(sys.executable)):
+            names += sorted(glob.glob(os.path.join(folder, "libcrypto*.dll")), reverse=True)
+    for name in filter(None, names):
+        try:
+            lib = ctypes.CDLL(name)
+            lib.AES_ige_encrypt
+        except (OSError, AttributeError):
+            continue
+        return lib
+    return None
+
+
+def libcrypto_backend():
+    lib = find_libcrypto()
+    if lib is None:
+        return None
+    key_ptr = ctypes.POINTER(AES_KEY)
+    lib.AES_set_encrypt_key.argtypes = lib.AES_set_decrypt_key.argtypes = [ctypes.c_char_p, ctypes.c_int, key_ptr]
+    lib.AES_ige_encrypt.argtypes = [ctypes.c_char_p, ctypes.c_char_p, ctypes.c_size_t, key_ptr, ctypes.c_char_p, ctypes.c_int]
+    lib.AES_ige_encrypt.restype = None
+
+    def run(data, key, iv, encrypt):
+        aes_key = AES_KEY()
+        (lib.AES_set_encrypt_key if encrypt else lib.AES_set_decrypt_key)(bytes(key), len(key) * 8, aes_key)
+        out = ctypes.create_string_buffer(len(data))
+        # OpenSSL menimpa ivec, jadi diberi salinan
+        lib.AES_ige_encrypt(bytes(data), out, len(data), aes_key, ctypes.create_string_buffer(bytes(iv), len(iv)), int(encrypt))
+        return out.raw
+
+    return (lambda data, key, iv: run(data, key, iv, True)), (lambda data, key, iv: run(data, key, iv, False))
+
+
+def ige_from_ecb(make_block):
+    """Build IGE encrypt/decrypt from a per-key AES-ECB block function factory `make_block(key, encrypt)`."""
+
+    def run(data, key, iv, encrypt):
+        block = make_block(key, encrypt)
+        # Enkripsi: c_i = E(p_i ^ c_{i-1}) ^ p_{i-1}; dekripsi: p_i = D(c_i ^ p_{i-1}) ^ c_{i-1}
+        prev_out, prev_in = (iv[:16], iv[16:]) if encrypt else (iv[16:], iv[:16])
+        prev_out, prev_in = int.from_bytes(prev_out, "big"), int.from_bytes(prev_in, "big")
+        out = bytearray()
+        for start in range(0, len(data), 16):
+            chunk = int.from_bytes(data[start:start + 16], "big")
+            result = int.from_bytes(block((chunk ^ prev_out).to_bytes(16, "big")), "big") ^ prev_in
+            out += result.to_bytes(16, "big")
+            prev_out, prev_in = result, chunk
+        return bytes(out)
+
+    return (lambda data, key, iv: run(data, key, iv, True)), (lambda data, key, iv: run(data, key, iv, False))
+
+
+def cryptography_backend():
+    try:
+        from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+    except ImportError:
+        return None
+
+    def make_block(key, encrypt):
+        cipher = Cipher(algorithms.AES(bytes(key)), modes.ECB())
+        return (cipher.encryptor() if encrypt else cipher.decryptor()).update
+
+    return ige_from_ecb(make_block)
+
+
+def cryptg_backend():
+    try:
+        import cryptg
+    except ImportError:
+        return None
+    return cryptg.encrypt_ige, cryptg.decrypt_ige
+
+
+def available_backends():
+    """name -> (encrypt_ige, decrypt_ige) for every backend importable here, Telethon's own last."""
+    backends = {}
+    for name, factory in (("cryptg", cryptg_backend), ("libcrypto", libcrypto_backend), ("cryptography", cryptography_backend)):
+        try:
+            pair = factory()
+        except Exception as e:
+            logging.error(f"[CRYPTO] - Backend {name} gagal dimuat: {e}")
+            continue
+        if pair is not None:
+            backends[name] = pair
+    backends[f"telethon ({telethon_default()})"] = (telethon_encrypt, telethon_decrypt)
+    return backends
+
+
+def self_check(encrypt, decrypt):
+    """The backend must match Telethon's output and round-trip on a fixed sample."""
+    key, iv, data = bytes(range(32)), bytes(range(32, 64)), bytes(range(64, 128))
+    cipher_text = encrypt(data, key, iv)
+    return cipher_text == telethon_encrypt(data, key, iv) and decrypt(cipher_text, key, iv) == data
+
+
+def counted(func, pad=False):
+    """Wrap an IGE function so the bytes and CPU time spent in it land in crypto_stats."""
+
+    def wrapper(data, key, iv):
+        if pad and len(data) % 16:
+            # Sama seperti AES.encrypt_ige milik Telethon
+            data += os.urandom(16 - len(data) % 16)
+        started = time.perf_counter()
+        result = func(data, key, iv)
+        crypto_stats["seconds"] += time.perf_counter() - started
+        crypto_stats["calls"] += 1
+        crypto_stats["bytes"] += len(data)
+        return result
+
+    return staticmethod(wrapper)
+
+
+def rank(backends, size=AUTO_SIZE, seconds=AUTO_SECONDS):
+    """Backend names ordered by measured encrypt + decrypt time per byte on `size`-byte payloads, quickest first."""
+    def cost(name):
+        encrypt, decrypt = backends[name]
+        return 1 / measure(encrypt, size, seconds) + 1 / measure(decrypt, size, seconds)
+
+    return sorted(backends, key=cost)
+
+
+def install_backend(preferred="auto"):
+    """Select the AES-IGE backend Telethon uses for every packet; returns its name.
+
+    "auto" runs a short benchmark (rank) over every importable backend that
+    passes self_check(), Telethon's own included, and takes the quickest;
+    "telethon" keeps Telethon's own choice. Either way the functions are
+    wrapped to count bytes and CPU time.
+    """
+    backends = available_backends()
+    default = next(reversed(backends))
+    if preferred == "auto":
+        candidates = list(backends)
+    elif preferred == "telethon":
+        candidates = []
+    else:
+        candidates = [preferred] if preferred in backends else []
+        if not candidates:
+            logging.error(f"[CRYPTO] - Backend {preferred} tidak tersedia, memakai {default}")
+    usable = []
+    for candidate in candidates:
+        if self_check(*backends[candidate]):
+            usable.append(candidate)
+        else:
+            logging.error(f"[CRYPTO] - Backend {candidate} gagal self-check, dilewati")
+    if preferred == "auto" and len(usable) > 1:
+        usable = rank({name: backends[name] for name in usable})
+    name = usable[0] if usable else default
+    encrypt, decrypt = backends[name]
+    active.clear()
+    active[name] = (encrypt, decrypt)
+    telethon_aes.AES.encrypt_ige = counted(encrypt, pad=True)
+    telethon_aes.AES.decrypt_ige = counted(decrypt)
+    return name
+
+
+def measure(func, size, seconds=BENCH_SECONDS):
+    """Throughput of one IGE function on `size`-byte payloads, in bytes per second."""
+    key, iv, data = os.urandom(32), os.urandom(32), os.urandom(size)
+    rounds, started = 0, time.perf_counter()
+    while True:
+        func(data, key, iv)
+        rounds += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= seconds:
+            return rounds * size / elapsed
+
+
+def benchmark(backends=None, sizes=PAYLOAD_SIZES, seconds=BENCH_SECONDS):
+    """name -> {size: (encrypt B/s, decrypt B/s)}; blocking, run it in a thread."""
+    backends = backends or available_backends()
+    return {
+        name: {size: (measure(encrypt, size, seconds), measure(decrypt, size, seconds)) for size in sizes}
+        for name, (encrypt, decrypt) in backends.items()
+    }
+
+
+def format_rate(rate):
+    if rate >= 1024 * 1024:
+        return f"{rate / (1024 * 1024):.1f} MB/s"
+    return f"{rate / 1024:.0f} KB/s"
+
+
+def format_size(size):
+    return f"{size // 1024} KB" if size >= 1024 else f"{size} B"
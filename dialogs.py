@@ -0,0 +1,99 @@
+import time
+import bisect
+import difflib
+
+
+class DialogIndex:
+    """In-memory index of the account's groups, searchable by title.
+
+    Entries are keyed by chat id; titles are casefolded so `.addgroup` can
+    answer exact, prefix and fuzzy lookups without walking the dialogs.
+    """
+
+    def __init__(self):
+        self.entries = {}     # chat id -> {"title": ..., "peer": ...}
+        self.by_title = {}    # casefolded title -> set of chat ids
+        self.built_at = None  # waktu crawl penuh terakhir
+        self._sorted = None   # daftar judul terurut untuk pencarian prefix (dibangun ulang bila perlu)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, chat_id):
+        return chat_id in self.entries
+
+    def get(self, chat_id):
+        return self.entries.get(chat_id)
+
+    def update(self, chat_id, title, peer=None):
+        """Add a group or refresh its title/peer."""
+        old = self.entries.get(chat_id)
+        if old is not None:
+            if peer is None:
+                peer = old.get("peer")
+            self._unlink(chat_id, old["title"])
+        self.entries[chat_id] = {"title": title, "peer": peer}
+        self.by_title.setdefault(title.casefold(), set()).add(chat_id)
+        self._sorted = None
+
+    def remove(self, chat_id):
+        """Forget a group the account has left; returns the removed entry."""
+        entry = self.entries.pop(chat_id, None)
+        if entry is not None:
+            self._unlink(chat_id, entry["title"])
+            self._sorted = None
+        return entry
+
+    def _unlink(self, chat_id, title):
+        key = title.casefold()
+        ids = self.by_title.get(key)
+        if ids is not None:
+            ids.discard(chat_id)
+            if not ids:
+                del self.by_title[key]
+
+    def replace_all(self, entries):
+        """Replace the index with the result of a full dialog crawl."""
+        self.entries.clear()
+        self.by_title.clear()
+        for chat_id, title, peer in entries:
+            self.update(chat_id, title, peer)
+        self.built_at = time.time()
+
+    def find(self, name, limit=10):
+        """Look a title up; returns (matches, kind) where kind is "exact", "prefix", "fuzzy" or None."""
+        key = name.casefold().strip()
+        if key in self.by_title:
+            return sorted(self.by_title[key]), "exact"
+
+        if self._sorted is None:
+            self._sorted = sorted(self.by_title)
+        matches = []
+        position = bisect.bisect_left(self._sorted, key)
+        while position < len(self._sorted) and self._sorted[position].startswith(key):
+            matches.extend(sorted(self.by_title[self._sorted[position]]))
+            position += 1
+        if matches:
+            return matches[:limit], "prefix"
+
+        close = difflib.get_close_matches(key, self._sorted, n=limit, cutoff=0.6)
+        matches = [chat_id for title in close for chat_id in sorted(self.by_title[title])]
+        return matches[:limit], ("fuzzy" if matches else None)
+
+    def to_dict(self):
+        return {
+            "built_at": self.built_at,
+            "entries": {str(chat_id): dict(entry) for chat_id, entry in self.entries.items()},
+        }
+
+    def load(self, data):
+        """Restore an index saved with to_dict()."""
+        self.entries.clear()
+        self.by_title.clear()
+        self._sorted = None
+        if not data:
+            self.built_at = None
+            return
+        for chat_id, entry in data.get("entries", {}).items():
+            self.update(int(chat_id), entry["title"], entry.get("peer"))
+        self.built_at = data.get("built_at")
@@ -0,0 +1,94 @@
+import time
+import asyncio
+import logging
+from telethon import TelegramClient
+from telethon.client.updates import EventBuilderDict
+
+# Batas antrean update mentah dari MTProtoSender
+MAX_UPDATE_QUEUE = 1000
+# Setiap update ke-N yang dibuang tetap dibangun (tanpa handler) untuk mengukur biaya yang dihemat
+SAMPLE_EVERY = 100
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """Update queue that drops the oldest entry instead of growing without bound.
+
+    Telethon's MessageBox notices the resulting pts gap and fetches the
+    difference, so a dropped batch is recovered rather than lost.
+    """
+
+    def __init__(self, maxsize=MAX_UPDATE_QUEUE):
+        super().__init__(maxsize)
+        self.dropped = 0
+        self.peak = 0
+
+    def put_nowait(self, item):
+        if self.full():
+            self.get_nowait()
+            self.dropped += 1
+        super().put_nowait(item)
+        self.peak = max(self.peak, self.qsize())
+
+    async def put(self, item):
+        self.put_nowait(item)
+
+
+class LowIngestClient(TelegramClient):
+    """TelegramClient that drops unwanted updates before any event object is built.
+
+    `update_filter(update)` runs right after the MessageBox has applied the
+    update (so pts bookkeeping stays correct) and before Telethon schedules
+    a dispatch task; updates it rejects never reach the event builders.
+    """
+
+    def __init__(self, *args, update_filter=None, max_queue=MAX_UPDATE_QUEUE, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.update_filter = update_filter
+        self.ingest_stats = {"received": 0, "dropped": 0, "samples": 0, "sample_time": 0.0}
+        if max_queue:
+            # Sender sudah memegang referensi antrean lama; ganti keduanya
+            self._updates_queue = BoundedUpdateQueue(max_queue)
+            self._sender._updates_queue = self._updates_queue
+
+    def _preprocess_updates(self, updates, users, chats):
+        updates = super()._preprocess_updates(updates, users, chats)
+        self.ingest_stats["received"] += len(updates)
+        if self.update_filter is None:
+            return updates
+        kept = []
+        for update in updates:
+            try:
+                keep = self.update_filter(update)
+            except Exception:
+                # Error di filter tidak boleh sampai ke _update_loop (Telethon memutus koneksi); update tetap diproses
+                logging.exception(f"[INGEST] - Filter gagal untuk {type(update).__name__}, update tetap diproses")
+                keep = True
+            if keep:
+                kept.append(update)
+                continue
+            self.ingest_stats["dropped"] += 1
+            if self.ingest_stats["dropped"] % SAMPLE_EVERY == 1:
+                self._sample_build_cost(update)
+        return kept
+
+    def _sample_build_cost(self, update):
+        """Build the events a dropped update would have produced, without running handlers."""
+        started = time.perf_counter()
+        try:
+            built = EventBuilderDict(self, update, None)
+            for builder, _ in self._event_builders:
+                built[type(builder)]
+        except Exception:
+            return
+        self.ingest_stats["samples"] += 1
+        self.ingest_stats["sample_time"] += time.perf_counter() - started
+
+    def ingest_summary(self):
+        """Counters plus an estimate of the event-building time the dropped updates would have cost."""
+        stats = dict(self.ingest_stats)
+        mean = stats["sample_time"] / stats["samples"] if stats["samples"] else 0.0
+        stats["saved_seconds"] = stats["dropped"] * mean
+        queue = self._updates_queue
+        stats["queue_dropped"] = getattr(queue, "dropped", 0)
+        stats["queue_peak"] = getattr(queue, "peak", queue.qsize())
+        return stats
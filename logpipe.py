@@ -0,0 +1,130 @@
+import os
+import json
+import gzip
+import queue
+import shutil
+import time
+import logging
+import logging.handlers
+
+# Default rotasi: 5 MB per file atau setiap 24 jam, simpan 7 arsip .gz
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 3600
+LOG_BACKUPS = 7
+
+COLORS = {"INFO": "\033[94m", "SUCCESS": "\033[92m", "ERROR": "\033[91m"}
+# Field terstruktur yang ikut ditulis ke sink JSON-lines bila ada di record
+STRUCTURED_FIELDS = ("event", "action", "status", "group_id", "group_name", "latency", "error")
+
+
+def gzip_rotator(source, dest):
+    """Compress a rotated log file and drop the original."""
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class RotatingLogHandler(logging.handlers.RotatingFileHandler):
+    """RotatingFileHandler that also rolls over on age and gzips the archives."""
+
+    def __init__(self, filename, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_SECONDS, backup_count=LOG_BACKUPS):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True)
+        self.interval = interval
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = gzip_rotator
+        # Waktu mulai file disimpan di sidecar supaya restart tidak mereset jadwal rotasi
+        # (mtime tidak bisa dipakai: file yang terus ditulis selalu tampak baru)
+        self.opened_file = f"{self.baseFilename}.opened"
+        self.rollover_at = self.read_opened() + interval
+
+    def read_opened(self):
+        """Start time of the current log file, recorded in the sidecar on first use."""
+        try:
+            with open(self.opened_file, "r") as f:
+                return float(f.read())
+        except (OSError, ValueError):
+            pass
+        # File lama tanpa sidecar: pakai waktu pembuatan jika OS menyediakannya
+        try:
+            opened = getattr(os.stat(self.baseFilename), "st_birthtime", time.time())
+        except OSError:
+            opened = time.time()
+        self.write_opened(opened)
+        return opened
+
+    def write_opened(self, opened):
+        try:
+            os.makedirs(os.path.dirname(self.opened_file), exist_ok=True)
+            with open(self.opened_file, "w") as f:
+                f.write(repr(opened))
+        except OSError:
+            pass
+
+    def shouldRollover(self, record):
+        if self.interval and time.time() >= self.rollover_at and os.path.exists(self.baseFilename):
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        opened = time.time()
+        self.write_opened(opened)
+        self.rollover_at = opened + self.interval
+
+
+class ConsoleFormatter(logging.Formatter):
+    """Console format; log_action records keep their coloured [STATUS - USERBOT] header."""
+
+    def format(self, record):
+        status = getattr(record, "status", None)
+        if status is None:
+            return super().format(record)
+        color = COLORS.get(status, COLORS["INFO"])
+        stamp = self.formatTime(record, "%Y-%m-%d %H:%M:%S")
+        return f"{color}[{status} - USERBOT]\033[0m - {stamp} - {record.getMessage()}"
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """One JSON object per line with the structured fields of the record."""
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "message": record.getMessage(),
+        }
+        for field in STRUCTURED_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def setup_logging(log_dir, json_sink=False, max_bytes=LOG_MAX_BYTES, interval=LOG_ROTATE_SECONDS, backup_count=LOG_BACKUPS):
+    """Route the root logger through a QueueHandler; file/console I/O runs on the listener thread.
+
+    Returns the started QueueListener (stop it before exit to drain the queue).
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    log_format = "%(asctime)s - %(message)s"
+
+    file_handler = RotatingLogHandler(os.path.join(log_dir, "app.log"), max_bytes, interval, backup_count)
+    file_handler.setFormatter(logging.Formatter(log_format))
+    console = logging.StreamHandler()
+    console.setFormatter(ConsoleFormatter(log_format))
+    handlers = [file_handler, console]
+    if json_sink:
+        json_handler = RotatingLogHandler(os.path.join(log_dir, "events.jsonl"), max_bytes, interval, backup_count)
+        json_handler.setFormatter(JsonLinesFormatter())
+        handlers.append(json_handler)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(logging.INFO)
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
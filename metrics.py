@@ -0,0 +1,160 @@
+import bisect
+import asyncio
+import logging
+from collections import deque
+
+# Batas bucket histogram (detik) untuk output Prometheus
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 1800, 3600)
+# Jumlah sampel terakhir yang disimpan untuk persentil
+RESERVOIR_SIZE = 1024
+
+
+def label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in key) + "}"
+
+
+class Histogram:
+    """Cumulative buckets for Prometheus plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=RESERVOIR_SIZE)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        self.recent.append(value)
+        position = bisect.bisect_left(self.buckets, value)
+        if position < len(self.counts):
+            self.counts[position] += 1
+
+    def percentile(self, q):
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class Metrics:
+    """In-process counters, gauges and histograms keyed by name and labels."""
+
+    def __init__(self):
+        self.counters = {}    # name -> {label key -> value}
+        self.histograms = {}  # name -> {label key -> Histogram}
+        self.gauges = {}      # name -> callable returning the current value
+        self.help = {}
+
+    def describe(self, name, text):
+        self.help[name] = text
+
+    def inc(self, name, value=1, **labels):
+        series = self.counters.setdefault(name, {})
+        key = label_key(labels)
+        series[key] = series.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        series = self.histograms.setdefault(name, {})
+        key = label_key(labels)
+        if key not in series:
+            series[key] = Histogram()
+        series[key].observe(value)
+
+    def gauge(self, name, func, text=None):
+        """Register a gauge whose value is read from `func` at scrape time."""
+        self.gauges[name] = func
+        if text:
+            self.help[name] = text
+
+    def counter(self, name, **labels):
+        return self.counters.get(name, {}).get(label_key(labels), 0)
+
+    def counter_by(self, name, label):
+        """Sum a counter per value of one label, e.g. {"ok": 40, "failed": 2}."""
+        totals = {}
+        for key, value in self.counters.get(name, {}).items():
+            group = dict(key).get(label)
+            totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def histogram(self, name, **labels):
+        return self.histograms.get(name, {}).get(label_key(labels))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in sorted(series.items()):
+                lines.append(f"{name}{format_labels(key)} {value}")
+        for name, func in sorted(self.gauges.items()):
+            try:
+                value = func()
+            except Exception as e:
+                logging.error(f"[METRICS] - Gauge {name} gagal dibaca: {e}")
+                continue
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+        for name, series in sorted(self.histograms.items()):
+            lines.append(f"# HELP {name} {self.help.get(name, name)}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, hist in sorted(series.items(), key=lambda item: item[0]):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', bound),))} {cumulative}")
+                lines.append(f"{name}_bucket{format_labels(key + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{name}_sum{format_labels(key)} {hist.sum:.6f}")
+                lines.append(f"{name}_count{format_labels(key)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+async def monitor_loop_lag(metrics, interval=1.0):
+    """Measure how late the event loop wakes up from a sleep and record it as `loop_lag_seconds`."""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        metrics.observe("loop_lag_seconds", max(0.0, loop.time() - started - interval))
+
+
+async def serve_metrics(metrics, host="127.0.0.1", port=9464):
+    """Serve `GET /metrics` in Prometheus text format using only asyncio.start_server."""
+
+    async def handle(reader, writer):
+        try:
+            request = await asyncio.wait_for(reader.readline(), timeout=5)
+            # Header request dibaca sampai baris kosong lalu diabaikan
+            while (await asyncio.wait_for(reader.readline(), timeout=5)).strip():
+                pass
+            parts = request.decode("latin-1").split()
+            if len(parts) >= 2 and parts[0] == "GET" and parts[1].split("?")[0] in ("/", "/metrics"):
+                status, body = "200 OK", metrics.render()
+            else:
+                status, body = "404 Not Found", "not found\n"
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\n"
+                "Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                "Connection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logging.info(f"[METRICS] - Endpoint Prometheus aktif di http://{host}:{port}/metrics")
+    return server
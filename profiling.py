@@ -0,0 +1,175 @@
+import io
+import os
+import sys
+import time
+import selectors
+import asyncio
+import logging
+import threading
+import traceback
+import tracemalloc
+from collections import deque
+
+# Loop dianggap macet jika heartbeat terlambat lebih dari ini (detik)
+LAG_THRESHOLD = 0.5
+# Frame dari event loop sendiri tidak dianggap "pelaku" saat loop macet
+INTERNAL_FILES = (os.path.dirname(asyncio.__file__), selectors.__file__, threading.__file__)
+
+
+async def profile_loop(seconds, limit=40):
+    """Run cProfile on the event-loop thread for `seconds`; returns (pstats report, top 5 lines by own time)."""
+    # Diimpor saat dipakai saja supaya tidak menambah waktu startup
+    import cProfile
+    import pstats
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        profiler.disable()
+    output = io.StringIO()
+    stats = pstats.Stats(profiler, stream=output)
+    stats.strip_dirs()
+    output.write(f"cProfile of the event loop for {seconds}s\n\n== by own time ==\n")
+    stats.sort_stats("tottime").print_stats(limit)
+    output.write("\n== by cumulative time ==\n")
+    stats.sort_stats("cumulative").print_stats(limit)
+    # stats.stats: (file, line, func) -> (primitive calls, calls, own time, cumulative time, callers)
+    top = [
+        f"{func} ({os.path.basename(filename)}:{line}) {own * 1000:.0f} ms own, {calls} calls"
+        for (filename, line, func), (_, calls, own, _, _) in sorted(
+            stats.stats.items(), key=lambda item: item[1][2], reverse=True
+        )[:5]
+    ]
+    return output.getvalue(), top
+
+
+class MemoryTracker:
+    """tracemalloc snapshots with a baseline to diff against."""
+
+    def __init__(self, frames=10):
+        self.frames = frames
+        self.baseline = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.baseline = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self.baseline = None
+        tracemalloc.stop()
+
+    def report(self, limit=15):
+        """Current/peak traced memory plus the top allocation growth since the baseline."""
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        lines = [f"Traced: {current / 1024:.0f} KB now, {peak / 1024:.0f} KB peak"]
+        if self.baseline is not None:
+            lines.append(f"Top {limit} changes since baseline:")
+            for stat in snapshot.compare_to(self.baseline, "lineno")[:limit]:
+                lines.append(f"  {stat}")
+        lines.append(f"Top {limit} allocations:")
+        for stat in snapshot.statistics("lineno")[:limit]:
+            lines.append(f"  {stat}")
+        return "\n".join(lines)
+
+
+def await_chain(task):
+    """Frames of a task from its outer coroutine down to the one it is waiting in (Task.get_stack stops at the first)."""
+    frames = []
+    coro = task.get_coro()
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is not None:
+            frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+def dump_tasks(names=None, limit=8):
+    """Text dump of every asyncio task with its current stack; `names` maps tasks to friendly labels."""
+    names = names or {}
+    tasks = sorted(asyncio.all_tasks(), key=lambda task: task.get_name())
+    output = io.StringIO()
+    output.write(f"{len(tasks)} asyncio task(s)\n")
+    for task in tasks:
+        coro = task.get_coro()
+        label = names.get(task, "")
+        output.write(f"\n== {task.get_name()} {label} {getattr(coro, '__qualname__', coro)}".rstrip() + "\n")
+        stack = await_chain(task)[-limit:]
+        if not stack:
+            output.write("  (no frames)\n")
+        for frame in stack:
+            output.write(f"  {frame.f_code.co_filename}:{frame.f_lineno} in {frame.f_code.co_name}\n")
+    return output.getvalue()
+
+
+def task_summary(task, names=None):
+    """One line per task: name, label and the innermost non-asyncio line it is suspended at."""
+    coro = task.get_coro()
+    stack = [frame for frame in await_chain(task) if not frame.f_code.co_filename.startswith(INTERNAL_FILES)]
+    where = f"{stack[-1].f_code.co_name} {os.path.basename(stack[-1].f_code.co_filename)}:{stack[-1].f_lineno}" if stack else "-"
+    parts = [task.get_name(), (names or {}).get(task), getattr(coro, "__qualname__", str(coro)), f"@ {where}"]
+    return " ".join(part for part in parts if part)
+
+
+class LoopWatchdog:
+    """Background thread that notices when the event loop stops ticking and logs what it is running.
+
+    The loop updates a heartbeat every `interval`; when it is late by more
+    than `threshold`, the loop thread's current stack is captured with
+    sys._current_frames(), so the log names the function that is blocking.
+    """
+
+    def __init__(self, threshold=LAG_THRESHOLD, interval=0.1, on_stall=None):
+        self.threshold = threshold
+        self.interval = interval
+        self.on_stall = on_stall
+        self.stalls = deque(maxlen=20)
+        self._beat = time.monotonic()
+        self._loop = None
+        self._thread_id = None
+        self._stopped = threading.Event()
+
+    def start(self, loop=None):
+        self._loop = loop or asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self._heartbeat()
+        threading.Thread(target=self._watch, name="loop-watchdog", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _heartbeat(self):
+        self._beat = time.monotonic()
+        if not self._stopped.is_set():
+            self._loop.call_later(self.interval, self._heartbeat)
+
+    def culprit(self):
+        """The innermost frame of the loop thread that is not asyncio/threading internals."""
+        frame = sys._current_frames().get(self._thread_id)
+        stack = traceback.extract_stack(frame) if frame is not None else []
+        for entry in reversed(stack):
+            if not entry.filename.startswith(INTERNAL_FILES):
+                return f"{entry.filename}:{entry.lineno} in {entry.name}", stack
+        return "unknown", stack
+
+    def _watch(self):
+        stall = None
+        while not self._stopped.wait(self.interval):
+            lag = time.monotonic() - self._beat - self.interval
+            if lag > self.threshold and stall is None:
+                where, stack = self.culprit()
+                stall = {"started": time.time() - lag, "where": where, "stack": "".join(traceback.format_list(stack[-8:]))}
+                logging.warning(f"[LAG] - Event loop blocked for {lag:.2f}s in {where}")
+            elif lag <= self.threshold and stall is not None:
+                stall["duration"] = time.time() - stall["started"]
+                self.stalls.append(stall)
+                logging.warning(f"[LAG] - Event loop resumed after {stall['duration']:.2f}s (blocked in {stall['where']})")
+                if self.on_stall is not None:
+                    self._loop.call_soon_threadsafe(self.on_stall, stall)
+                stall = None
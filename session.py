@@ -0,0 +1,171 @@
+import time
+import logging
+from telethon import utils
+from telethon.sessions import SQLiteSession
+from telethon.tl.types import PeerUser, PeerChat, PeerChannel
+
+# Default: tulis entity ke disk paling sering tiap 60 detik, simpan maksimal 5000 entity
+FLUSH_INTERVAL = 60
+MAX_ENTITIES = 5000
+# Setelah pruning, tabel diisi sampai 90% dari batas supaya tidak prune di setiap flush
+PRUNE_TARGET = 0.9
+
+
+class BufferedSession(SQLiteSession):
+    """SQLiteSession that keeps the entity cache in memory and writes it in batches.
+
+    Telethon calls process_entities() for almost every update; here that only
+    touches a dict. Telethon's periodic save() (about once a minute) triggers
+    flush(), which writes the changed rows in one WAL transaction and prunes
+    the least recently used entities beyond `max_entities`, except for the
+    ids passed to protect() (the configured groups).
+    """
+
+    def __init__(self, session_id=None, max_entities=MAX_ENTITIES, flush_interval=FLUSH_INTERVAL):
+        # Atribut diisi sebelum super().__init__, yang bisa memanggil save() saat upgrade database
+        self.max_entities = max_entities
+        self.flush_interval = flush_interval
+        self.protected = {0}
+        self.flushes = 0
+        self.pruned = 0
+        self._rows = {}
+        self._dirty = set()
+        self._touched = set()
+        self._deleted = set()
+        self._last_flush = time.time()
+        super().__init__(session_id)
+        c = self._cursor()
+        try:
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+            # id -> [hash, username, phone, name, date]; date = terakhir dilihat/dipakai (untuk LRU)
+            self._rows = {
+                row[0]: list(row[1:])
+                for row in c.execute("select id, hash, username, phone, name, date from entities")
+            }
+        finally:
+            c.close()
+
+    def protect(self, ids):
+        """Never prune these marked peer ids (replaces the previous set)."""
+        # id 0 adalah baris "diri sendiri" yang disimpan Telethon
+        self.protected = set(ids) | {0}
+
+    # Entity processing
+    def process_entities(self, tlo):
+        if not self.save_entities:
+            return
+        now = int(time.time())
+        for entity_id, entity_hash, username, phone, name in self._entities_to_rows(tlo):
+            row = self._rows.get(entity_id)
+            if row is not None and row[0] == entity_hash and (
+                row[1:4] == [username, phone, name] or username is phone is name is None
+            ):
+                # Tidak berubah (atau hanya InputPeer tanpa nama dari cache Telethon): cukup catat waktunya
+                row[4] = now
+                self._touched.add(entity_id)
+                continue
+            self._rows[entity_id] = [entity_hash, username, phone, name, now]
+            self._dirty.add(entity_id)
+            self._deleted.discard(entity_id)
+
+    def _found(self, entity_id):
+        row = self._rows[entity_id]
+        row[4] = int(time.time())
+        self._touched.add(entity_id)
+        return entity_id, row[0]
+
+    def get_entity_rows_by_phone(self, phone):
+        for entity_id, row in self._rows.items():
+            if row[2] == phone:
+                return self._found(entity_id)
+
+    def get_entity_rows_by_username(self, username):
+        # Username yang sama bisa dipakai ulang; ambil yang paling baru dilihat
+        matches = [entity_id for entity_id, row in self._rows.items() if row[1] == username]
+        if matches:
+            return self._found(max(matches, key=lambda entity_id: self._rows[entity_id][4] or 0))
+
+    def get_entity_rows_by_name(self, name):
+        for entity_id, row in self._rows.items():
+            if row[3] == name:
+                return self._found(entity_id)
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            ids = (id,)
+        else:
+            ids = (
+                utils.get_peer_id(PeerUser(id)),
+                utils.get_peer_id(PeerChat(id)),
+                utils.get_peer_id(PeerChannel(id)),
+            )
+        for entity_id in ids:
+            if entity_id in self._rows:
+                return self._found(entity_id)
+
+    # Persistence
+    def prune(self):
+        """Drop the least recently used unprotected entities beyond max_entities."""
+        excess = len(self._rows) - self.max_entities
+        if excess <= 0:
+            return 0
+        excess = len(self._rows) - int(self.max_entities * PRUNE_TARGET)
+        candidates = sorted(
+            (row[4] or 0, entity_id) for entity_id, row in self._rows.items() if entity_id not in self.protected
+        )
+        for _, entity_id in candidates[:excess]:
+            del self._rows[entity_id]
+            self._dirty.discard(entity_id)
+            self._touched.discard(entity_id)
+            self._deleted.add(entity_id)
+        self.pruned += min(excess, len(candidates))
+        return min(excess, len(candidates))
+
+    def flush(self):
+        """Write changed entities, last-used times and deletions in one transaction."""
+        self._last_flush = time.time()
+        self.prune()
+        if not (self._dirty or self._touched or self._deleted):
+            return
+        dirty, self._dirty = self._dirty, set()
+        touched, self._touched = self._touched - dirty, set()
+        deleted, self._deleted = self._deleted, set()
+        c = self._cursor()
+        try:
+            c.executemany(
+                "insert or replace into entities values (?,?,?,?,?,?)",
+                [(entity_id, *self._rows[entity_id]) for entity_id in dirty if entity_id in self._rows],
+            )
+            c.executemany(
+                "update entities set date = ? where id = ?",
+                [(self._rows[entity_id][4], entity_id) for entity_id in touched if entity_id in self._rows],
+            )
+            c.executemany("delete from entities where id = ?", [(entity_id,) for entity_id in deleted])
+            self._conn.commit()
+            self.flushes += 1
+        except Exception as e:
+            self._dirty |= dirty
+            self._touched |= touched
+            self._deleted |= deleted
+            logging.error(f"[SESSION] - Gagal menyimpan entity: {e}")
+        finally:
+            c.close()
+
+    def save(self):
+        if time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+        super().save()
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+        super().close()
+
+    def stats(self):
+        return {
+            "entities": len(self._rows),
+            "pending": len(self._dirty) + len(self._deleted),
+            "flushes": self.flushes,
+            "pruned": self.pruned,
+        }
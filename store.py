@@ -0,0 +1,308 @@
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+# Default jeda sebelum perubahan ditulis ke disk (detik)
+FLUSH_DELAY = 1.0
+# Batas jeda antar percobaan ulang jika penulisan terus gagal (disk penuh, izin, file terkunci)
+FLUSH_RETRY_MAX = 60.0
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file, fsync it and atomically replace the target."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=4)  # Save with indentation for readability
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class JsonStore:
+    """Write-behind JSON persistence with a dirty flag per collection."""
+
+    def __init__(self, files, snapshots, delay=FLUSH_DELAY):
+        # files: collection -> path, snapshots: collection -> callable returning a copy of the data
+        self.files = files
+        self.snapshots = snapshots
+        self.delay = delay
+        self.dirty = set()
+        self.writes = 0
+        # mtime (ns) dari file yang kita tulis sendiri, agar watcher tidak memuat ulang tulisan sendiri
+        self.mtimes = {}
+        self._task = None
+        # Satu worker agar urutan penulisan tetap terjaga
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="store")
+
+    def load(self, collection, default=None):
+        """Read a collection from disk, returning `default` when the file is missing."""
+        path = self.files[collection]
+        if not os.path.exists(path):
+            return default
+        with open(path, "r") as f:
+            return json.load(f)
+
+    def mark_dirty(self, *collections):
+        """Flag collections as changed and schedule a single debounced flush."""
+        self.dirty.update(collections)
+        self._schedule()
+
+    def mark_rows(self, collection, *ids):
+        """Flag single entries of a collection as changed; a JSON file is always rewritten whole."""
+        if ids:
+            self.mark_dirty(collection)
+
+    def _schedule(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Belum ada event loop (mis. saat startup): tulis langsung
+            self.flush_now()
+            return
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._flush_later())
+
+    def _pending(self):
+        return bool(self.dirty)
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.delay)
+        failures = 0
+        # Perubahan yang masuk selama penulisan ikut di-flush pada putaran berikutnya
+        while self._pending():
+            if await self.flush():
+                failures = 0
+                continue
+            # Error yang menetap tidak boleh jadi loop rapat: tunggu makin lama sebelum mencoba lagi
+            failures += 1
+            await asyncio.sleep(min(self.delay * 2 ** failures, FLUSH_RETRY_MAX))
+
+    def _take_snapshot(self):
+        dirty, self.dirty = self.dirty, set()
+        return {name: self.snapshots[name]() for name in dirty}
+
+    def _write(self, payload):
+        for name, data in payload.items():
+            write_json_atomic(self.files[name], data)
+            self.mtimes[name] = os.stat(self.files[name]).st_mtime_ns
+            self.writes += 1
+
+    async def flush(self):
+        """Write all dirty collections from the thread-pool executor; returns False if the write failed."""
+        payload = self._take_snapshot()
+        if not payload:
+            return True
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._executor, self._write, payload)
+        except Exception as e:
+            # Ditulis ulang utuh pada percobaan berikutnya
+            self.dirty.update(payload)
+            logging.error(f"[STORE] - Gagal menyimpan {', '.join(payload)}: {e}")
+            return False
+        return True
+
+    def discard(self, *collections):
+        """Drop pending changes of collections that are about to be reloaded from disk."""
+        self.dirty.difference_update(collections)
+
+    def flush_now(self):
+        """Synchronously write everything that is still dirty (used before exit/restart)."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+        # Lewat executor yang sama supaya tidak menyalip penulisan yang sedang berjalan
+        self._executor.submit(self._write, self._take_snapshot()).result()
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS groups (id INTEGER PRIMARY KEY, position INTEGER NOT NULL, name TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS whitelist (id INTEGER PRIMARY KEY, position INTEGER NOT NULL, name TEXT, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS messages (position INTEGER PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS stats (
+    id INTEGER PRIMARY KEY,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    last_sent REAL,
+    last_error TEXT
+);
+CREATE TABLE IF NOT EXISTS kv (name TEXT PRIMARY KEY, data TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# Koleksi yang berupa daftar grup (id sebagai primary key, urutan lewat `position`)
+GROUP_TABLES = ("groups", "whitelist")
+
+
+class SqliteStore(JsonStore):
+    """SQLite (WAL) backend with the same write-behind interface as JsonStore.
+
+    The JSON files are imported once on first open and can be exported back
+    with export_json(), so switching backends needs no manual migration.
+    The connection is opened and used only on the store's worker thread;
+    load() hands its query to that thread and waits for the result.
+    Collections with a row snapshot (stats, groups) can be marked per id with
+    mark_rows(); only those rows are upserted. mark_dirty() still rewrites the
+    whole table, for adds, removals and reorders.
+    """
+
+    def __init__(self, db_path, files, snapshots, delay=FLUSH_DELAY, row_snapshots=None):
+        super().__init__(files, snapshots, delay)
+        # row_snapshots: collection -> callable(ids) returning {id: copy of the entry, or None if it is gone}
+        self.row_snapshots = row_snapshots or {}
+        self.dirty_rows = {}
+        self.db_path = db_path
+        self.db = None
+        self._executor.submit(self._open).result()
+
+    def _open(self):
+        # Dibuka di thread worker: sqlite3 menolak koneksi ini dipakai dari thread lain
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self._import_json_once()
+
+    def _import_json_once(self):
+        if self.db.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone():
+            return
+        payload = {}
+        for name in self.files:
+            data = super().load(name)
+            if data is not None:
+                payload[name] = data
+        self._write({name: ("all", data) for name, data in payload.items()})
+        with self.db:
+            self.db.execute("INSERT OR REPLACE INTO meta VALUES ('imported', ?)", (",".join(payload),))
+        logging.info(f"[STORE] - Data JSON diimpor ke {self.db_path}: {', '.join(payload) or '-'}")
+
+    def load(self, collection, default=None):
+        """Read a collection from its table, returning `default` when it is empty."""
+        # Lewat worker yang sama: tidak berbagi koneksi antar thread dan tidak membaca di tengah penulisan
+        return self._executor.submit(self._load, collection, default).result()
+
+    def _load(self, collection, default=None):
+        if collection in GROUP_TABLES:
+            rows = self.db.execute(f"SELECT data FROM {collection} ORDER BY position").fetchall()
+            return [json.loads(data) for (data,) in rows] if rows else default
+        if collection == "messages":
+            rows = self.db.execute("SELECT data FROM messages ORDER BY position").fetchall()
+            return [json.loads(data) for (data,) in rows] if rows else default
+        if collection == "stats":
+            rows = self.db.execute("SELECT id, sent, failed, last_sent, last_error FROM stats").fetchall()
+            if not rows:
+                return default
+            return {
+                str(chat_id): {"sent": sent, "failed": failed, "last_sent": last_sent, "last_error": last_error}
+                for chat_id, sent, failed, last_sent, last_error in rows
+            }
+        row = self.db.execute("SELECT data FROM kv WHERE name = ?", (collection,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def mark_rows(self, collection, *ids):
+        if not ids:
+            return
+        if collection not in self.row_snapshots:
+            self.mark_dirty(collection)
+            return
+        self.dirty_rows.setdefault(collection, set()).update(ids)
+        self._schedule()
+
+    def discard(self, *collections):
+        super().discard(*collections)
+        for name in collections:
+            self.dirty_rows.pop(name, None)
+
+    def _pending(self):
+        return bool(self.dirty or self.dirty_rows)
+
+    def _take_snapshot(self):
+        # name -> ("all", data) untuk tulis ulang tabel, atau ("rows", {id: entry}) untuk upsert per baris
+        dirty, self.dirty = self.dirty, set()
+        dirty_rows, self.dirty_rows = self.dirty_rows, {}
+        payload = {name: ("all", self.snapshots[name]()) for name in dirty}
+        for name, ids in dirty_rows.items():
+            if name not in payload:
+                payload[name] = ("rows", self.row_snapshots[name](ids))
+        return payload
+
+    def _write(self, payload):
+        if not payload:
+            return
+        with self.db:
+            for name, (mode, data) in payload.items():
+                if mode == "rows":
+                    self._write_rows(name, data)
+                else:
+                    self._write_collection(name, data)
+                self.writes += 1
+
+    def _write_rows(self, name, rows):
+        """Upsert changed entries (and delete the ones that are gone) without touching the rest of the table."""
+        removed = [(entry_id,) for entry_id, entry in rows.items() if entry is None]
+        changed = [(entry_id, entry) for entry_id, entry in rows.items() if entry is not None]
+        self.db.executemany(f"DELETE FROM {name} WHERE id = ?", removed)
+        if name == "stats":
+            self.db.executemany(
+                "INSERT INTO stats (id, sent, failed, last_sent, last_error) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET sent = excluded.sent, failed = excluded.failed, "
+                "last_sent = excluded.last_sent, last_error = excluded.last_error",
+                [
+                    (int(chat_id), row.get("sent", 0), row.get("failed", 0), row.get("last_sent"), row.get("last_error"))
+                    for chat_id, row in changed
+                ],
+            )
+        else:
+            # Posisi baris yang sudah ada tetap; baris baru ditaruh di akhir
+            self.db.executemany(
+                f"INSERT INTO {name} (id, position, name, data) "
+                f"VALUES (?, (SELECT COALESCE(MAX(position), -1) + 1 FROM {name}), ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, data = excluded.data",
+                [(group_id, group.get("name"), json.dumps(group)) for group_id, group in changed],
+            )
+
+    def _write_collection(self, name, data):
+        if name in GROUP_TABLES:
+            self.db.execute(f"DELETE FROM {name}")
+            self.db.executemany(
+                f"INSERT OR REPLACE INTO {name} (id, position, name, data) VALUES (?, ?, ?, ?)",
+                [
+                    (group["id"], position, group.get("name"), json.dumps(group))
+                    for position, group in enumerate(data)
+                ],
+            )
+        elif name == "messages":
+            self.db.execute("DELETE FROM messages")
+            self.db.executemany(
+                "INSERT INTO messages (position, data) VALUES (?, ?)",
+                [(position, json.dumps(message)) for position, message in enumerate(data)],
+            )
+        elif name == "stats":
+            self.db.execute("DELETE FROM stats")
+            self.db.executemany(
+                "INSERT INTO stats (id, sent, failed, last_sent, last_error) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (int(chat_id), row.get("sent", 0), row.get("failed", 0), row.get("last_sent"), row.get("last_error"))
+                    for chat_id, row in data.items()
+                ],
+            )
+        else:
+            self.db.execute("INSERT OR REPLACE INTO kv (name, data) VALUES (?, ?)", (name, json.dumps(data)))
+
+    async def export(self):
+        """Flush pending changes, then export to JSON from the store's worker thread."""
+        await self.flush()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.export_json)
+
+    def export_json(self):
+        """Write every collection back to its JSON file (on the worker thread); returns the exported names."""
+        exported = []
+        for name, path in self.files.items():
+            data = self._load(name)
+            if data is not None:
+                write_json_atomic(path, data)
+                exported.append(name)
+        return exported
@@ -1,83 +1,238 @@
+import time
+# For uptime and startup timing: taken before the heavy imports (Telethon)
+START_TIME = time.time()
 import os
+import re
 import json
 import asyncio
+import heapq
+import itertools
 import random
 import sys
 import logging
-import random
-import time
-import coloredlogs
-from dotenv import load_dotenv
-from telethon import TelegramClient, events
-from telethon.errors import SessionPasswordNeededError
-from datetime import datetime
+import base64
+import io
+import atexit
+import importlib
+from dotenv import load_dotenv, find_dotenv
+from telethon import events, utils
+from telethon.errors import (
+    SessionPasswordNeededError, ChannelPrivateError, PeerIdInvalidError, FloodWaitError, SlowModeWaitError,
+    ChatWriteForbiddenError, UserBannedInChannelError, ChatAdminRequiredError, ChatRestrictedError,
+    ChatGuestSendForbiddenError, FileReferenceExpiredError,
+)
+from telethon.extensions import html, BinaryReader
+from telethon.tl.types import (
+    InputPeerChannel, InputPeerChat, MessageMediaWebPage, Chat, Channel, PeerChannel, UpdateChannel,
+    UpdateNewMessage, UpdateNewChannelMessage, UpdateShortMessage, UpdateShortChatMessage, MessageService,
+    UpdateChatParticipantAdd, UpdateChatParticipantDelete, InputChannel, ChannelForbidden, ChatForbidden,
+)
+from telethon.tl.functions.channels import GetChannelsRequest, GetFullChannelRequest
+from telethon.tl.functions.messages import GetChatsRequest
+from datetime import datetime, timedelta
+from collections import deque
+from store import JsonStore, SqliteStore
+from dialogs import DialogIndex
+from profiling import profile_loop, MemoryTracker, LoopWatchdog, dump_tasks, task_summary, LAG_THRESHOLD
+from metrics import Metrics, monitor_loop_lag, serve_metrics
+from ingest import LowIngestClient, MAX_UPDATE_QUEUE
+from session import BufferedSession, MAX_ENTITIES, FLUSH_INTERVAL
+from crypto import (
+    install_backend, available_backends, benchmark, telethon_default, crypto_stats, format_rate, format_size,
+    active as crypto_active,
+)
+from logpipe import setup_logging, LOG_MAX_BYTES, LOG_ROTATE_SECONDS, LOG_BACKUPS
 
 # Load environment variables
-load_dotenv()
+ENV_FILE = find_dotenv() or ".env"
+load_dotenv(ENV_FILE)
 API_ID = int(os.getenv("API_ID"))
 API_HASH = os.getenv("API_HASH")
 PHONE = os.getenv("PHONE")
-DELAY_MIN = 30
-DELAY_MAX = 60
-BREAK_DELAY = 10800  # 3 hours
+DELAY_MIN = int(os.getenv("DELAY_MIN", 30))
+DELAY_MAX = int(os.getenv("DELAY_MAX", 60))
+BREAK_DELAY = int(os.getenv("BREAK_DELAY", 10800))  # 3 hours
+QUARANTINE_BASE = 3600  # 1 hour, doubled on every repeated failure
+QUARANTINE_MAX = 7 * 86400
+PROGRESS_EDIT_INTERVAL = 30  # detik minimal antar edit pesan progress
+JOB_BACKOFF_BASE = 10  # detik sebelum job yang crash dijalankan ulang, dilipatgandakan tiap crash beruntun
+JOB_BACKOFF_MAX = 900
+JOB_STALL_GRACE = 300  # job dianggap macet jika tidak ada progres selama jeda yang diharapkan + ini
+JOB_WATCH_INTERVAL = 30
+DIALOG_INDEX_MAX_AGE = 24 * 3600  # crawl ulang semua dialog jika snapshot lebih tua dari ini
+SCAN_BATCH = 100  # jumlah grup per GetChannels/GetChats saat cek kesehatan grup
+CHANNEL_UPDATE_DELAY = 2.0  # detik menampung UpdateChannel sebelum dicek dalam satu GetChannels
+LIST_PAGE_SIZE = 50  # baris per halaman untuk .grup, .grupall dan .whitelistlist
+MESSAGE_PAGE_SIZE = 10  # pesan per halaman untuk .pesan
+MESSAGE_LIMIT = 4096  # batas karakter satu pesan Telegram
+PREVIEW_CHARS = 300  # panjang maksimal preview pesan di .pesan
 
 GROUPS_FILE = "groups.json"
 MESSAGES_FILE = "messages.json"
-
-# For uptime tracking
-START_TIME = time.time()
+WHITELIST_FILE = "whitelist.json"
+STATS_FILE = "stats.json"
+JOBS_FILE = "jobs.json"
+QUARANTINE_FILE = "quarantine.json"
+DIALOGS_FILE = "dialogs.json"
+# Backend penyimpanan: "json" (default) atau "sqlite"
+STORE_BACKEND = os.getenv("STORE_BACKEND", "json").lower()
+DB_FILE = os.getenv("STORE_DB", "userbot.db")
+# Mode hemat update: hanya perintah keluar dan event dialog yang diproses (LOW_INGEST=0 untuk menonaktifkan)
+LOW_INGEST = os.getenv("LOW_INGEST", "1").lower() not in ("0", "false", "no")
+# Batasi perintah ke chat tertentu (id dipisah koma, mis. Saved Messages); kosong = semua chat
+COMMAND_CHATS = {int(chat_id) for chat_id in os.getenv("COMMAND_CHATS", "").split(",") if chat_id.strip()}
+# Cek kesehatan semua grup (batch) sebelum setiap putaran (HEALTH_SCAN=0 untuk menonaktifkan)
+HEALTH_SCAN = os.getenv("HEALTH_SCAN", "1").lower() not in ("0", "false", "no")
+# Modul plugin (dipisah koma) yang mendaftarkan perintah lewat setup(bot); bisa di-reload dengan .reload
+PLUGINS = [name.strip() for name in os.getenv("PLUGINS", "").split(",") if name.strip()]
+# Watcher config: cek perubahan file data dan .env setiap N detik (0 = nonaktif)
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", 5))
+# Endpoint Prometheus opsional, tanpa autentikasi: selalu hanya di loopback; port 0 = nonaktif
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+# Backend AES-IGE untuk MTProto: auto (diukur singkat saat startup, yang tercepat dipakai) atau nama backend
+CRYPTO_BACKEND = os.getenv("CRYPTO_BACKEND", "auto").lower()
+# Diisi .restart sebelum exec, supaya proses baru bisa melaporkan downtime-nya
+RESTARTED_AT = float(os.environ.pop("RESTARTED_AT", 0) or 0)
 
 # Ensure the 'logs/' directory exists
 log_dir = os.path.join(os.path.dirname(__file__), "logs")
-if not os.path.exists(log_dir):
-    os.makedirs(log_dir)
-
-# Configure Logging without Colors
-log_format = "%(asctime)s - %(message)s"
-logging.basicConfig(
-    level=logging.INFO,
-    format=log_format,
-    handlers=[
-        logging.FileHandler(os.path.join(log_dir, "app.log")),
-        logging.StreamHandler()
-    ],
+
+# Logging lewat QueueHandler: tulis file/console/rotasi dikerjakan thread listener, bukan event loop
+log_listener = setup_logging(
+    log_dir,
+    json_sink=os.getenv("LOG_JSON", "").lower() in ("1", "true", "yes"),  # logs/events.jsonl
+    max_bytes=int(os.getenv("LOG_MAX_BYTES", LOG_MAX_BYTES)),
+    interval=float(os.getenv("LOG_ROTATE_HOURS", LOG_ROTATE_SECONDS / 3600)) * 3600,
+    backup_count=int(os.getenv("LOG_BACKUPS", LOG_BACKUPS)),
 )
 
+def stop_logging():
+    """Drain the log queue and stop the listener thread (before exit/restart)."""
+    global log_listener
+    if log_listener is not None:
+        log_listener.stop()
+        log_listener = None
+
+atexit.register(stop_logging)
+
 # Helper Function to Log Events with Format
-def log_event(event_type, details=None, group_name=None, group_id=None):
+def log_event(event_type, details=None, group_name=None, group_id=None, latency=None, error=None):
     if event_type == "MSG":
         message = f"[MSG] - Pesan dikirimkan ke {group_name} - {group_id}"
     elif event_type == "FWD":
         message = f"[FWD] - Pesan diteruskan ke {group_name} - {group_id}"
+    elif event_type == "FAIL":
+        message = f"[FAIL] - Pesan gagal dikirim ke {group_name} - {group_id}: {error} {details or ''}".rstrip()
+    elif event_type == "FLOOD":
+        message = f"[FLOOD] - FloodWait {details} detik sebelum {group_name} - {group_id}"
+    elif event_type == "SLOWMODE":
+        message = f"[SLOWMODE] - {group_name} - {group_id} dijadwalkan ulang dalam {details} detik"
+    elif event_type == "SESSION":
+        message = f"[SESSION] - {details}"
+    elif event_type == "CYCLE":
+        message = f"[CYCLE] - Sesi selesai: {details}"
     elif event_type == "DELAY":
         message = f"[DELAY] - Pesan dijeda selama {details} detik"
     elif event_type == "BREAK":
         message = f"[BREAK] - Pesan ditunda selama {details} jam hingga pengiriman selanjutnya"
     else:
         message = f"[UNKNOWN] - {details}"
-
-    logging.info(message)
-
-# Contoh penggunaan fungsi log_event
-log_event("MSG", None, group_name="My Group", group_id=12345)
-log_event("FWD", None, group_name="My Group", group_id=12345)
-log_event("DELAY", "30")
-log_event("BREAK", "2")
+    if latency is not None:
+        message += f" ({latency * 1000:.0f} ms)"
+
+    # Field terstruktur untuk sink JSON-lines
+    fields = {
+        "event": event_type,
+        "group_id": group_id,
+        "group_name": group_name,
+        "latency": round(latency, 4) if latency is not None else None,
+        "error": str(error) if error is not None else None,
+    }
+    logging.info(message, extra=fields)
 
 # Logging helper function
 def log_action(action, details, status="INFO"):
-    """Log actions with colored tags."""
-    colors = {"INFO": "\033[94m", "SUCCESS": "\033[92m", "ERROR": "\033[91m"}
-    color = colors.get(status, "\033[94m")
-    header = f"{color}[{status} - USERBOT]\033[0m - {time.strftime('%Y-%m-%d %H:%M:%S')} - {action}"
-    print(f"{header} - {details}")
-
-client = TelegramClient("userbot_session", API_ID, API_HASH)
+    """Log actions with colored tags (colour is applied by the console handler)."""
+    level = logging.ERROR if status == "ERROR" else logging.INFO
+    logging.log(level, f"{action} - {details}", extra={"action": action, "status": status})
+
+# Session dengan cache entity di memori; ditulis per batch dan dibatasi ukurannya
+session = BufferedSession(
+    "userbot_session",
+    max_entities=int(os.getenv("SESSION_MAX_ENTITIES", MAX_ENTITIES)),
+    flush_interval=float(os.getenv("SESSION_FLUSH_INTERVAL", FLUSH_INTERVAL)),
+)
+def keep_update(update):
+    """Low-ingest filter: keep our own command messages and the updates the dialog index needs."""
+    if isinstance(update, (UpdateNewMessage, UpdateNewChannelMessage)):
+        message = update.message
+        if isinstance(message, MessageService):
+            # Join/leave/ganti judul untuk track_chat_action
+            return True
+        # MessageEmpty tidak punya out/message
+        if not (getattr(message, "out", False) and (getattr(message, "message", None) or "").startswith(".")):
+            return False
+        return not COMMAND_CHATS or utils.get_peer_id(message.peer_id) in COMMAND_CHATS
+    if isinstance(update, UpdateShortMessage):
+        return update.out and update.message.startswith(".") and (not COMMAND_CHATS or update.user_id in COMMAND_CHATS)
+    if isinstance(update, UpdateShortChatMessage):
+        return update.out and update.message.startswith(".") and (not COMMAND_CHATS or -update.chat_id in COMMAND_CHATS)
+    return isinstance(update, (UpdateChannel, UpdateChatParticipantAdd, UpdateChatParticipantDelete))
+
+# Pilih backend enkripsi sebelum koneksi pertama; throughput-nya diukur setelah startup
+crypto_backend = install_backend(CRYPTO_BACKEND)
+# Ukuran -> (encrypt B/s, decrypt B/s) untuk backend aktif
+crypto_throughput = {}
+
+# catch_up=False: setelah restart tidak menarik ulang semua update yang terlewat
+client = LowIngestClient(
+    session, API_ID, API_HASH,
+    catch_up=False,
+    update_filter=keep_update if LOW_INGEST else None,
+    max_queue=int(os.getenv("MAX_UPDATE_QUEUE", MAX_UPDATE_QUEUE)),
+)
 
 # Load group IDs and messages
 group_ids = []
 messages = []
+# Pesan yang sudah di-parse sekali: sejajar dengan `messages`
+templates = []
 whitelist_groups = []
+group_stats = {}
+# Checkpoint job yang berjalan (kind -> state), supaya bisa dilanjutkan setelah restart/crash
+job_state = {}
+# Grup yang menolak pengiriman (izin/banned): chat id -> {"until", "strikes", "error", "name"}
+quarantine = {}
+# Snapshot semua grup di akun (judul -> id), diperbarui dari event
+dialog_index = DialogIndex()
+
+# Counter dan histogram in-process untuk .status dan endpoint /metrics
+metrics = Metrics()
+metrics.describe("deliveries_total", "Delivery attempts by kind and outcome")
+metrics.describe("floodwait_seconds_total", "Seconds spent waiting on FloodWait")
+metrics.describe("rpc_latency_seconds", "Resolve + send/forward latency per delivery")
+metrics.describe("cycle_duration_seconds", "Duration of a full pass over the groups")
+metrics.describe("handler_seconds", "Command handler latency")
+metrics.describe("loop_lag_seconds", "Event loop wake-up delay")
+metrics.describe("loop_stalls_total", "Times a callback blocked the event loop longer than LAG_THRESHOLD")
+metrics.describe("loop_stall_seconds", "Duration of event loop stalls")
+metrics.describe("job_failures_total", "Background job crashes by kind")
+metrics.describe("job_restarts_total", "Background job restarts by the supervisor")
+metrics.describe("job_stalls_total", "Jobs flagged for missing their expected progress")
+
+def record_stall(stall):
+    metrics.inc("loop_stalls_total")
+    metrics.observe("loop_stall_seconds", stall["duration"])
+
+# Profiling: watchdog macetnya loop, tracemalloc untuk .mem, dan penanda .profile yang sedang berjalan
+watchdog = LoopWatchdog(threshold=float(os.getenv("LAG_THRESHOLD", LAG_THRESHOLD)), on_stall=record_stall)
+memory_tracker = MemoryTracker()
+profiling_active = False
+
+# Index chat id -> entry, selalu sinkron dengan group_ids / whitelist_groups
+group_index = {}
+whitelist_index = {}
 
 selected_message_index = 0
 task = None
@@ -85,44 +240,264 @@ forward_task = None
 
 # Load groups and messages from files
 def load_data():
-    """Load groups and messages from JSON files."""
-    global group_ids, messages
-    if os.path.exists(GROUPS_FILE):
-        with open(GROUPS_FILE, "r") as f:
-            data = json.load(f)
-            # Konversi elemen `id` saja ke format lengkap
-            group_ids = [
-                {"id": group["id"], "name": group.get("name", f"Unknown Group {group['id']}")}
-                if isinstance(group, dict)
-                else {"id": group, "name": f"Unknown Group {group}"}
-                for group in data
-            ]
-    if os.path.exists(MESSAGES_FILE):
-        with open(MESSAGES_FILE, "r") as f:
-            messages = json.load(f)
-
-def save_data():
-    """Save groups and messages to JSON files."""
-    with open(GROUPS_FILE, "w") as f:
-        json.dump(group_ids, f, indent=4)  # Save with indentation for readability
-    with open(MESSAGES_FILE, "w") as f:
-        json.dump(messages, f, indent=4)
-
-# Load whitelist from file (optional)
-WHITELIST_FILE = "whitelist.json"
-if os.path.exists(WHITELIST_FILE):
-    with open(WHITELIST_FILE, "r") as f:
-        whitelist_groups = json.load(f)
-
-def save_whitelist():
-    """Save whitelist groups to JSON file."""
-    global whitelist_groups
-    with open(WHITELIST_FILE, "w") as f:
-        json.dump(whitelist_groups, f, indent=4)
+    """Load groups, messages and whitelist from JSON files."""
+    load_lists()
+    group_stats.clear()
+    group_stats.update((int(chat_id), row) for chat_id, row in store.load("stats", {}).items())
+    job_state.clear()
+    job_state.update(store.load("jobs", {}))
+    quarantine.clear()
+    quarantine.update((int(chat_id), entry) for chat_id, entry in store.load("quarantine", {}).items())
+    dialog_index.load(store.load("dialogs"))
+    reindex()
+
+# Koleksi yang bisa dimuat ulang tanpa restart (.reload / watcher)
+RELOADABLE = ("groups", "messages", "whitelist")
+
+def load_lists(collections=RELOADABLE):
+    """(Re)load groups, messages and whitelist in place, so running jobs keep seeing the same lists."""
+    global selected_message_index
+    if "groups" in collections:
+        # Konversi elemen `id` saja ke format lengkap
+        group_ids[:] = [
+            {**group, "name": group.get("name", f"Unknown Group {group['id']}")}
+            if isinstance(group, dict)
+            else {"id": group, "name": f"Unknown Group {group}"}
+            for group in store.load("groups", [])
+        ]
+    if "messages" in collections:
+        messages[:] = store.load("messages", [])
+        templates[:] = [compile_message(message) for message in messages]
+        selected_message_index = min(selected_message_index, max(len(messages) - 1, 0))
+    if "whitelist" in collections:
+        whitelist_groups[:] = store.load("whitelist", [])
+    reindex()
+
+def reindex():
+    """Rebuild the id -> entry indexes after a bulk change to the group lists."""
+    group_index.clear()
+    group_index.update((group["id"], group) for group in group_ids)
+    whitelist_index.clear()
+    whitelist_index.update((group["id"], group) for group in whitelist_groups)
+    # Entity grup yang dikonfigurasi tidak boleh ikut terhapus oleh pruning session
+    session.protect(itertools.chain(group_index, whitelist_index))
+
+# Startup
+# Data lokal dimuat di thread terpisah sambil connect; handler menunggu sampai selesai
+data_ready = asyncio.Event()
+# Tahap startup -> detik sejak proses mulai
+startup_times = {}
+
+def mark_startup(stage):
+    startup_times.setdefault(stage, time.time() - START_TIME)
+
+def format_startup():
+    return ", ".join(f"{stage} {format_seconds(seconds)}" for stage, seconds in startup_times.items()) or "-"
+
+async def load_startup_data():
+    """Load the local state off the event loop (runs while the client connects)."""
+    await asyncio.to_thread(load_data)
+    mark_startup("data")
+    data_ready.set()
+
+def take_by_indices(groups, indices):
+    """Remove 1-based indices from a group list in one pass and return the removed entries."""
+    wanted = set(indices)
+    kept, taken = [], []
+    for position, group in enumerate(groups, start=1):
+        (taken if position in wanted else kept).append(group)
+    groups[:] = kept
+    return taken
+
+def record_delivery(result):
+    """Update the per-group delivery stats from a dispatch result."""
+    stats = group_stats.setdefault(result["peer_id"], {"sent": 0, "failed": 0, "last_sent": None, "last_error": None})
+    if result["outcome"] == "ok":
+        stats["sent"] += 1
+        stats["last_sent"] = result["time"]
+    else:
+        stats["failed"] += 1
+        stats["last_error"] = f"{result['error']}: {result['detail']}"
+    save_rows("stats", result["peer_id"])
+
+def save_data(*collections):
+    """Mark collections as changed; the store writes them in the background."""
+    store.mark_dirty(*(collections or ("groups", "messages")))
+
+def save_rows(collection, *ids):
+    """Mark single entries as changed (SQLite upserts just those rows; JSON rewrites the file)."""
+    store.mark_rows(collection, *ids)
+
+# Write-behind store: perubahan dikumpulkan lalu ditulis atomik di thread terpisah
+STORE_FILES = {
+    "groups": GROUPS_FILE,
+    "messages": MESSAGES_FILE,
+    "whitelist": WHITELIST_FILE,
+    "stats": STATS_FILE,
+    "jobs": JOBS_FILE,
+    "quarantine": QUARANTINE_FILE,
+    "dialogs": DIALOGS_FILE,
+}
+STORE_SNAPSHOTS = {
+    "groups": lambda: [dict(group) for group in group_ids],
+    "messages": lambda: [dict(message) if isinstance(message, dict) else message for message in messages],
+    "whitelist": lambda: [dict(group) for group in whitelist_groups],
+    "stats": lambda: {chat_id: dict(row) for chat_id, row in group_stats.items()},
+    "jobs": lambda: {kind: dict(state) for kind, state in job_state.items() if state},
+    "quarantine": lambda: {chat_id: dict(entry) for chat_id, entry in quarantine.items()},
+    "dialogs": lambda: dialog_index.to_dict(),
+}
+# Snapshot per baris untuk save_rows: id -> salinan entry, atau None jika sudah tidak ada
+STORE_ROW_SNAPSHOTS = {
+    "groups": lambda ids: {chat_id: dict(group_index[chat_id]) if chat_id in group_index else None for chat_id in ids},
+    "stats": lambda ids: {chat_id: dict(group_stats[chat_id]) if chat_id in group_stats else None for chat_id in ids},
+}
+if STORE_BACKEND == "sqlite":
+    store = SqliteStore(DB_FILE, STORE_FILES, STORE_SNAPSHOTS, row_snapshots=STORE_ROW_SNAPSHOTS)
+else:
+    store = JsonStore(STORE_FILES, STORE_SNAPSHOTS)
+
+# Message templates
+# Pesan disimpan sebagai HTML (string) atau {"text": html, "media": {...}} jika ada media
+def encode_tl(obj):
+    """Serialize a TL object (e.g. an InputMedia) to base64 for JSON storage."""
+    return base64.b64encode(bytes(obj)).decode()
+
+def decode_tl(data):
+    """Rebuild a TL object serialized by encode_tl."""
+    return BinaryReader(base64.b64decode(data)).tgread_object()
+
+def compile_message(message):
+    """Parse a stored message once into plain text + MessageEntity list."""
+    if isinstance(message, dict):
+        body, media = message.get("text", ""), message.get("media")
+    else:
+        body, media = message, None
+    text, entities = html.parse(body)
+    return {
+        "text": text,
+        "entities": entities,
+        "media": media,
+        "input_media": decode_tl(media["input"]) if media and media.get("input") else None,
+    }
+
+def message_preview(message, limit=None):
+    """Return the HTML text of a stored message, marking ones that carry media; `limit` truncates the text."""
+    if isinstance(message, dict):
+        text, media = message.get("text", ""), message.get("media")
+    else:
+        text, media = message, None
+    if limit is not None and len(text) > limit:
+        text = text[:limit].rstrip() + "…"
+    return text + (" [media]" if media else "")
+
+async def get_input_media(index, refresh=False):
+    """Return the cached InputMedia of a template, fetching the source message only when needed."""
+    template = templates[index]
+    if template["input_media"] is None or refresh:
+        media = template["media"]
+        source = await client.get_messages(media["chat_id"], ids=media["msg_id"])
+        if source is None or source.media is None:
+            raise ValueError("Source message of the media is no longer available.")
+        template["input_media"] = utils.get_input_media(source.media)
+        messages[index] = {**messages[index], "media": {**media, "input": encode_tl(template["input_media"])}}
+        save_data("messages")
+        log_action("MEDIA REFRESH", f"File reference of message #{index + 1} refreshed", "INFO")
+    return template["input_media"]
+
+async def send_template(peer, index):
+    """Send a compiled template without re-parsing HTML or re-uploading media."""
+    template = templates[index]
+    if template["media"] is None:
+        await client.send_message(peer, template["text"], formatting_entities=template["entities"])
+        return
+    try:
+        await client.send_file(
+            peer, await get_input_media(index), caption=template["text"], formatting_entities=template["entities"]
+        )
+    except FileReferenceExpiredError:
+        await client.send_file(
+            peer, await get_input_media(index, refresh=True),
+            caption=template["text"], formatting_entities=template["entities"],
+        )
+
+# Peer cache: chat id -> InputPeer, disimpan juga di groups.json sebagai entry["peer"]
+peer_cache = {}
+peer_cache_stats = {"hits": 0, "misses": 0}
+
+def peer_to_dict(peer):
+    """Serialize an InputPeer so it can be stored next to its group entry."""
+    if isinstance(peer, InputPeerChannel):
+        return {"type": "channel", "id": peer.channel_id, "hash": peer.access_hash}
+    if isinstance(peer, InputPeerChat):
+        return {"type": "chat", "id": peer.chat_id}
+    return None
+
+def peer_from_dict(data):
+    """Rebuild an InputPeer from its stored form."""
+    if not data:
+        return None
+    if data.get("type") == "channel":
+        return InputPeerChannel(data["id"], data["hash"])
+    if data.get("type") == "chat":
+        return InputPeerChat(data["id"])
+    return None
+
+async def resolve_peer(group):
+    """Return the InputPeer for a group entry, resolving it only on a cache miss."""
+    peer = peer_cache.get(group["id"]) or peer_from_dict(group.get("peer"))
+    if peer is not None:
+        peer_cache[group["id"]] = peer
+        peer_cache_stats["hits"] += 1
+        return peer
+
+    peer_cache_stats["misses"] += 1
+    peer = utils.get_input_peer(await client.get_input_entity(group["id"]))
+    peer_cache[group["id"]] = peer
+    group["peer"] = peer_to_dict(peer)
+    save_rows("groups", group["id"])
+    return peer
+
+def invalidate_peer(group):
+    """Drop the cached peer of a single group so it is resolved again next time."""
+    peer_cache.pop(group["id"], None)
+    if group.pop("peer", None) is not None:
+        # Access hash lama jangan sampai dimuat lagi dari groups.json setelah restart/.reload
+        save_rows("groups", group["id"])
+    log_action("PEER CACHE", f"Invalidated peer for {group['name']} ({group['id']})", "ERROR")
+
+def add_group_entry(chat_id, name, peer=None):
+    """Append a group to group_ids (keeping the index and peer cache in sync); None if it exists."""
+    if chat_id in group_index:
+        return None
+    entry = {"id": chat_id, "name": name}
+    if peer:
+        entry["peer"] = peer
+        peer_cache[chat_id] = peer_from_dict(peer)
+    group_ids.append(entry)
+    group_index[chat_id] = entry
+    return entry
+
+# Dialog index
+def is_group_entity(entity):
+    """True for basic groups and megagroups (not broadcast channels or users)."""
+    return isinstance(entity, Chat) or (isinstance(entity, Channel) and entity.megagroup)
+
+async def build_dialog_index():
+    """Crawl all dialogs once and rebuild the group index from them."""
+    started = time.time()
+    entries = []
+    async for dialog in client.iter_dialogs():
+        if dialog.is_group:
+            entries.append((dialog.id, dialog.title, peer_to_dict(dialog.input_entity)))
+    dialog_index.replace_all(entries)
+    save_data("dialogs")
+    log_action("DIALOG INDEX", f"Indexed {len(entries)} groups in {time.time() - started:.1f}s", "SUCCESS")
 
-if os.path.exists(WHITELIST_FILE):
-    with open(WHITELIST_FILE, "r") as f:
-        whitelist_groups = json.load(f)
+async def ensure_dialog_index():
+    """Crawl dialogs only if there is no saved index or it is too old."""
+    if dialog_index.built_at is None or time.time() - dialog_index.built_at > DIALOG_INDEX_MAX_AGE:
+        await build_dialog_index()
 
 # Fungsi Utility: parse_indices
 def parse_indices(indices):
@@ -157,86 +532,906 @@ def get_uptime():
     minutes, seconds = divmod(remainder, 60)
     return f"{hours}h {minutes}m {seconds}s"
 
+def peer_cache_hit_rate():
+    lookups = peer_cache_stats["hits"] + peer_cache_stats["misses"]
+    return peer_cache_stats["hits"] / lookups if lookups else 0.0
+
+def format_seconds(seconds):
+    """Short human duration: 850 ms, 12.3s, 4m 05s, 2h 10m."""
+    if seconds < 1:
+        return f"{seconds * 1000:.0f} ms"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(int(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}m {seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h {minutes:02d}m"
+
+def format_histogram(name, **labels):
+    hist = metrics.histogram(name, **labels)
+    if hist is None or not hist.count:
+        return "-"
+    return f"p50 {format_seconds(hist.percentile(0.5))}, p99 {format_seconds(hist.percentile(0.99))}"
+
+metrics.gauge("uptime_seconds", lambda: round(time.time() - START_TIME, 1), "Seconds since the process started")
+metrics.gauge("peer_cache_hit_ratio", lambda: round(peer_cache_hit_rate(), 4), "Share of peer lookups served from cache")
+metrics.gauge("groups", lambda: len(group_ids), "Configured target groups")
+metrics.gauge("updates_dropped", lambda: client.ingest_summary()["dropped"], "Updates dropped before event building")
+metrics.gauge("session_entities", lambda: session.stats()["entities"], "Entities cached in the session")
+metrics.gauge("crypto_bytes", lambda: crypto_stats["bytes"], "Bytes encrypted/decrypted by MTProto AES-IGE")
+metrics.gauge("crypto_seconds", lambda: round(crypto_stats["seconds"], 4), "CPU seconds spent in MTProto AES-IGE")
+metrics.gauge("jobs_stalled", lambda: sum(1 for job in jobs.values() if job["stalled"]), "Running jobs currently flagged as stalled")
+metrics.gauge("quarantined_groups", lambda: len(quarantine), "Groups currently in quarantine")
+
 def get_status():
-    """Get bot status (online) and uptime."""
+    """Get bot status, uptime and the live counters."""
     status = "ONLINE"
     uptime = get_uptime()
-    log_action("STATUS CHECK", f"Status: {status}, Uptime: {uptime}", "INFO")
-    return f"Userbot is currently {status}.\nUptime: {uptime}."
+    outcomes = metrics.counter_by("deliveries_total", "outcome")
+    deliveries = ", ".join(f"{count} {outcome}" for outcome, count in sorted(outcomes.items())) or "none yet"
+    cycles = metrics.histogram("cycle_duration_seconds")
+    last_cycle = f"{format_seconds(cycles.recent[-1])} ({cycles.count} total)" if cycles else "-"
+    cache = (
+        f"{peer_cache_stats['hits']} hits, {peer_cache_stats['misses']} misses "
+        f"({peer_cache_hit_rate():.0%} hit rate)"
+    )
+    router = f"{router_stats['dispatched']} dispatched, {router_stats['rejected']} rejected"
+    ingest = client.ingest_summary()
+    ingest_info = (
+        f"{ingest['dropped']} of {ingest['received']} updates dropped early"
+        f" (~{format_seconds(ingest['saved_seconds'])} of event building saved), "
+        f"queue peak {ingest['queue_peak']}, {ingest['queue_dropped']} overflowed"
+    ) if LOW_INGEST else "off"
+    crypto_info = f"{crypto_backend} (Telethon default: {telethon_default()})"
+    if crypto_throughput:
+        size, (encrypt, decrypt) = next(iter(crypto_throughput.items()))
+        crypto_info += f", {format_size(size)}: encrypt {format_rate(encrypt)}, decrypt {format_rate(decrypt)}"
+    crypto_info += f"; {crypto_stats['bytes'] / (1024 * 1024):.1f} MB in {format_seconds(crypto_stats['seconds'])} CPU"
+    info = session.stats()
+    session_info = f"{info['entities']} entities, {info['pending']} pending, {info['flushes']} flushes, {info['pruned']} pruned"
+    handlers = metrics.histograms.get("handler_seconds", {}).values()
+    slowest = max((hist.percentile(0.99) for hist in handlers), default=None)
+    job_lines = "".join(f"\n  #{job['id']} {job['kind']}: {job_health(job)}" for job in jobs.values()) or " none running"
+    log_action("STATUS CHECK", f"Status: {status}, Uptime: {uptime}, Deliveries: {deliveries}, Peer cache: {cache}", "INFO")
+    return (
+        f"Userbot is currently {status}.\nUptime: {uptime}.\n"
+        f"Startup: {format_startup()}.\n"
+        f"Jobs:{job_lines}\n"
+        f"Deliveries: {deliveries}.\n"
+        f"Send latency: {format_histogram('rpc_latency_seconds')}.\n"
+        f"FloodWait absorbed: {format_seconds(metrics.counter('floodwait_seconds_total'))}.\n"
+        f"Last cycle: {last_cycle}.\n"
+        f"Peer cache: {cache}.\n"
+        f"Session: {session_info}.\n"
+        f"Low-ingest: {ingest_info}.\n"
+        f"Crypto: {crypto_info}.\n"
+        f"Event loop lag: {format_histogram('loop_lag_seconds')}.\n"
+        f"Commands: {router}"
+        + (f"; slowest handler p99 {format_seconds(slowest)}." if slowest is not None else ".")
+        + (f"\nMetrics: http://{METRICS_HOST}:{METRICS_PORT}/metrics" if METRICS_PORT else "")
+    )
+
+# Job checkpoints
+def checkpoint(state, position, targets=None, done=()):
+    """Record the next target of a running job; the store writes it in the background.
+
+    `done` lists ids after the cursor that were already handled out of order
+    by the scheduler, so a resumed job does not post to them twice.
+    """
+    targets = group_ids if targets is None else targets
+    state["cursor"] = position
+    state["next_id"] = targets[position]["id"] if position < len(targets) else None
+    state["done"] = list(done)
+    save_data("jobs")
+
+def resume_position(state, targets=None):
+    """Find where a job should continue, following its next group if the list changed."""
+    targets = group_ids if targets is None else targets
+    cursor = min(state.get("cursor", 0), len(targets))
+    next_id = state.get("next_id")
+    if next_id is None:
+        return cursor
+    if cursor < len(targets) and targets[cursor]["id"] == next_id:
+        return cursor
+    for position, group in enumerate(targets):
+        if group["id"] == next_id:
+            return position
+    return cursor
+
+async def start_break(state, progress=None):
+    """Checkpoint the end of the break, then sleep until it is over."""
+    state["break_until"] = time.time() + BREAK_DELAY
+    checkpoint(state, 0)
+    log_event("BREAK", BREAK_DELAY // 3600)  # Jam
+    await wait_break(state, progress)
+
+async def wait_break(state, progress=None):
+    """Sleep for whatever is left of a pending break (e.g. one that began before a restart)."""
+    remaining = (state.get("break_until") or 0) - time.time()
+    if remaining > 0:
+        heartbeat(progress, remaining)
+        await asyncio.sleep(remaining)
+    if state.get("break_until"):
+        state["break_until"] = None
+        save_data("jobs")
+
+def clear_job(kind):
+    """Forget the checkpoint of a job that was stopped."""
+    if job_state.pop(kind, None) is not None:
+        save_data("jobs")
+
+# Background jobs
+# Semua job yang berjalan: job id -> {"id", "kind", "task", "progress", "state_key", "status", "restarts", ...}
+jobs = {}
+job_ids = itertools.count(1)
+
+def start_job(kind, run, progress=None, state_key=None, resume=None):
+    """Run `run(resume)` as a supervised background job and return its job entry.
+
+    If the coroutine raises, the error is recorded and a new one is started
+    from the job's checkpoint in job_state, after a capped backoff and once
+    the client is connected again. The task stays the same, so .stop/.cancel
+    and the `task`/`forward_task` globals keep working.
+    """
+    job_id = next(job_ids)
+    job = {
+        "id": job_id, "kind": kind, "progress": progress, "state_key": state_key or kind,
+        "status": "running", "restarts": 0, "last_error": None, "stalled": None,
+    }
+    job["task"] = asyncio.create_task(supervise(job, run, resume))
+    jobs[job_id] = job
+    job["task"].add_done_callback(lambda _: jobs.pop(job_id, None))
+    return job
+
+async def supervise(job, run, resume):
+    failures = 0
+    while True:
+        started = time.time()
+        try:
+            return await run(resume)
+        except Exception as e:
+            # Backoff direset jika job sempat berjalan lebih lama dari backoff maksimum
+            failures = 1 if time.time() - started > JOB_BACKOFF_MAX else failures + 1
+            delay = min(JOB_BACKOFF_BASE * 2 ** (failures - 1), JOB_BACKOFF_MAX)
+            job["last_error"] = f"{type(e).__name__}: {e}"
+            metrics.inc("job_failures_total", kind=job["kind"])
+            logging.exception(f"[JOB] - Job #{job['id']} ({job['kind']}) failed: {job['last_error']}; restarting in {delay}s")
+        job["status"] = "backoff"
+        await asyncio.sleep(delay)
+        job["status"] = "waiting for connection"
+        await wait_connected()
+        # Lanjut dari checkpoint terakhir (None jika job belum sempat menyimpannya)
+        resume = job_state.get(job["state_key"])
+        job["status"] = "running"
+        job["restarts"] += 1
+        job["stalled"] = None
+        heartbeat(job["progress"])
+        metrics.inc("job_restarts_total", kind=job["kind"])
+        log_action("JOB", f"Job #{job['id']} ({job['kind']}) restarted (restart {job['restarts']})", "SUCCESS")
+
+async def wait_connected(poll=5):
+    """Return once the client is connected (reconnect() in main brings it back)."""
+    while not client.is_connected():
+        await asyncio.sleep(poll)
+
+def heartbeat(progress, expect=0):
+    """Mark progress of a job; the watchdog flags it if nothing happens within `expect` + JOB_STALL_GRACE seconds."""
+    if progress is None:
+        return
+    now = time.time()
+    progress["beat"] = now
+    progress["due"] = now + expect + JOB_STALL_GRACE
+
+def job_health(job):
+    """One-line state of a job, e.g. `running, last progress 12s ago, next due in 40s`."""
+    now = time.time()
+    parts = [job["status"]]
+    progress = job["progress"]
+    if job["stalled"]:
+        parts = [f"STALLED for {format_seconds(now - job['stalled'])}"]
+    if progress is not None:
+        parts.append(f"last progress {format_seconds(now - progress['beat'])} ago")
+        if job["status"] == "running" and not job["stalled"]:
+            parts.append(f"next due in {format_seconds(max(progress['due'] - JOB_STALL_GRACE - now, 0))}")
+    if job["restarts"]:
+        parts.append(f"{job['restarts']} restart(s)")
+    if job["last_error"]:
+        parts.append(f"last error: {job['last_error']}")
+    return ", ".join(parts)
+
+async def watch_jobs():
+    """Flag jobs whose heartbeat is overdue and clear the flag once they make progress again."""
+    while True:
+        await asyncio.sleep(JOB_WATCH_INTERVAL)
+        now = time.time()
+        for job in list(jobs.values()):
+            progress = job["progress"]
+            if progress is None or job["status"] != "running":
+                continue
+            if progress["due"] < now and not job["stalled"]:
+                job["stalled"] = progress["due"] - JOB_STALL_GRACE
+                metrics.inc("job_stalls_total", kind=job["kind"])
+                log_action(
+                    "WATCHDOG",
+                    f"Job #{job['id']} ({job['kind']}) stalled: no progress for {format_seconds(now - progress['beat'])}, "
+                    f"waiting in {task_summary(job['task'])}",
+                    "ERROR",
+                )
+            elif job["stalled"] and progress["due"] >= now:
+                log_action("WATCHDOG", f"Job #{job['id']} ({job['kind']}) is making progress again", "SUCCESS")
+                job["stalled"] = None
+
+def new_progress(label, message=None):
+    """Create the progress counters of a job; `message` is the (chat id, msg id) to keep edited."""
+    now = time.time()
+    return {
+        "label": label, "message": message, "total": 0, "done": 0,
+        "sent": 0, "failed": 0, "skipped": 0, "started": now, "last_edit": 0.0,
+        # Heartbeat untuk watch_jobs: progres terakhir dan batas progres berikutnya
+        "beat": now, "due": now + JOB_STALL_GRACE,
+    }
+
+def format_progress(progress):
+    """Render progress as e.g. `37/412 sent, 3 failed, ETA 29m`."""
+    text = f"{progress['sent']}/{progress['total']} sent, {progress['failed']} failed"
+    if progress["skipped"]:
+        text += f", {progress['skipped']} skipped"
+    remaining = progress["total"] - progress["done"]
+    if progress["done"] and remaining > 0:
+        eta = (time.time() - progress["started"]) / progress["done"] * remaining
+        text += f", ETA {int(eta) // 60}m"
+    return text
+
+async def report_progress(progress, outcome):
+    """Count a finished target and edit the command message at most every PROGRESS_EDIT_INTERVAL."""
+    if progress is None:
+        return
+    heartbeat(progress)
+    progress["done"] += 1
+    # "quarantined" adalah kiriman yang gagal (record_result menghitungnya failed), supaya .status dan progress sama
+    progress[{"ok": "sent", "failed": "failed", "quarantined": "failed"}.get(outcome, "skipped")] += 1
+    now = time.time()
+    if progress["message"] and now - progress["last_edit"] >= PROGRESS_EDIT_INTERVAL:
+        progress["last_edit"] = now
+        await edit_progress(progress, f"{progress['label']}: {format_progress(progress)}")
+
+async def edit_progress(progress, text):
+    """Edit the command message of a job, ignoring failures (e.g. the message was deleted)."""
+    if not progress or not progress["message"]:
+        return
+    chat_id, msg_id = progress["message"]
+    try:
+        await client.edit_message(chat_id, msg_id, text)
+    except Exception as e:
+        log_action("PROGRESS", f"Failed to update progress message: {e}", "ERROR")
+
+# Error handling & pacing
+# Error yang tidak akan hilang dengan sendirinya: grup dikarantina dengan backoff
+QUARANTINE_ERRORS = (
+    ChatWriteForbiddenError, UserBannedInChannelError, ChatAdminRequiredError,
+    ChatRestrictedError, ChatGuestSendForbiddenError,
+)
+
+def is_quarantined(group):
+    """Check whether a group is still serving its quarantine."""
+    entry = quarantine.get(group["id"])
+    return entry is not None and entry["until"] > time.time()
+
+def quarantine_group(group, error):
+    """Quarantine a group with exponential backoff on repeated permission errors."""
+    entry = quarantine.get(group["id"], {"strikes": 0})
+    strikes = entry["strikes"] + 1
+    duration = min(QUARANTINE_BASE * 2 ** (strikes - 1), QUARANTINE_MAX)
+    quarantine[group["id"]] = {
+        "until": time.time() + duration,
+        "strikes": strikes,
+        "error": type(error).__name__,
+        "name": group["name"],
+    }
+    save_data("quarantine")
+    log_action("QUARANTINE", f"{group['name']} ({group['id']}) for {duration // 3600}h: {type(error).__name__}", "ERROR")
+
+def release_quarantine(group):
+    """Forget the strikes of a group once it accepts a post again."""
+    if quarantine.pop(group["id"], None) is not None:
+        save_data("quarantine")
+
+# Group health scan
+def send_blocked_reason(chat):
+    """Why the account cannot post in a Channel/Chat, or None if it can."""
+    if isinstance(chat, (ChannelForbidden, ChatForbidden)):
+        return "banned or private"
+    if getattr(chat, "deactivated", False):
+        return "deactivated"
+    if getattr(chat, "migrated_to", None):
+        return "migrated to a supergroup"
+    if getattr(chat, "left", False):
+        return "not a member"
+    if getattr(chat, "creator", False):
+        return None
+    admin = getattr(chat, "admin_rights", None)
+    if isinstance(chat, Channel) and chat.broadcast:
+        return None if admin and admin.post_messages else "broadcast channel (admins only)"
+    if admin:
+        return None
+    for rights, label in ((getattr(chat, "banned_rights", None), "restricted"), (chat.default_banned_rights, "muted for members")):
+        if rights and (rights.send_messages or rights.send_plain):
+            return label
+    return None
+
+def apply_health(group, chat, slowmode=0):
+    """Store the scan result on a group entry; returns True when the entry changed."""
+    before = (group.get("left"), group.get("blocked"), group.get("slowmode"))
+    reason = send_blocked_reason(chat)
+    if reason == "not a member":
+        group["left"] = True
+    else:
+        group.pop("left", None)
+    if reason and reason != "not a member":
+        group["blocked"] = reason
+    else:
+        group.pop("blocked", None)
+    if slowmode:
+        group["slowmode"] = slowmode
+    else:
+        group.pop("slowmode", None)
+    group["checked"] = time.time()
+    return before != (group.get("left"), group.get("blocked"), group.get("slowmode"))
+
+async def scan_groups(targets):
+    """Check every target with batched GetChannels/GetChats (+GetFullChannel for slow mode).
+
+    Left, banned, muted and broadcast-only groups are marked so dispatch skips
+    them; returns {"checked", "changed", "requests", "unresolved"}.
+    """
+    channels, chats = {}, {}
+    report = {"checked": 0, "changed": 0, "requests": 0, "unresolved": 0}
+    for group in targets:
+        try:
+            peer = await resolve_peer(group)
+        except Exception:
+            report["unresolved"] += 1
+            continue
+        if isinstance(peer, InputPeerChannel):
+            channels[peer.channel_id] = (group, InputChannel(peer.channel_id, peer.access_hash))
+        elif isinstance(peer, InputPeerChat):
+            chats[peer.chat_id] = group
+
+    found = {}
+    # Hanya grup yang status kesehatannya berubah yang ditulis ulang; `checked` saja tidak perlu disimpan
+    changed = []
+    try:
+        items = list(channels.items())
+        for start in range(0, len(items), SCAN_BATCH):
+            batch = items[start:start + SCAN_BATCH]
+            result = await client(GetChannelsRequest([channel for _, (_, channel) in batch]))
+            report["requests"] += 1
+            found.update((("channel", chat.id), chat) for chat in result.chats)
+        chat_ids = list(chats)
+        for start in range(0, len(chat_ids), SCAN_BATCH):
+            result = await client(GetChatsRequest(chat_ids[start:start + SCAN_BATCH]))
+            report["requests"] += 1
+            found.update((("chat", chat.id), chat) for chat in result.chats)
+
+        for channel_id, (group, channel) in channels.items():
+            chat = found.get(("channel", channel_id))
+            if chat is None:
+                continue
+            slowmode = 0
+            if isinstance(chat, Channel) and chat.slowmode_enabled and not send_blocked_reason(chat):
+                # slowmode_seconds hanya ada di ChannelFull; diminta untuk grup yang slow mode-nya aktif saja
+                full = await client(GetFullChannelRequest(channel))
+                report["requests"] += 1
+                slowmode = full.full_chat.slowmode_seconds or 0
+            if apply_health(group, chat, slowmode):
+                report["changed"] += 1
+                changed.append(group["id"])
+            report["checked"] += 1
+        for chat_id, group in chats.items():
+            chat = found.get(("chat", chat_id))
+            if chat is not None:
+                if apply_health(group, chat):
+                    report["changed"] += 1
+                    changed.append(group["id"])
+                report["checked"] += 1
+    except FloodWaitError as e:
+        # Scan hanya optimasi: jangan tahan putaran karena FloodWait
+        log_action("HEALTH SCAN", f"Stopped early by FloodWait of {e.seconds}s", "ERROR")
+    except Exception as e:
+        log_action("HEALTH SCAN", f"Stopped early: {e}", "ERROR")
+    finally:
+        save_rows("groups", *changed)
+
+    log_action(
+        "HEALTH SCAN",
+        f"{report['checked']} checked in {report['requests']} requests, {report['changed']} changed, "
+        f"{sum(1 for group in targets if group.get('left') or group.get('blocked'))} unusable",
+        "INFO",
+    )
+    return report
+
+def is_usable(group):
+    """A target that can accept a post right now (not left, blocked or quarantined)."""
+    return not (group.get("left") or group.get("blocked") or is_quarantined(group))
+
+def pace():
+    """Draw the random delay before the next send; returns the earliest time it may happen."""
+    delay = random.randint(DELAY_MIN, DELAY_MAX)
+    log_event("DELAY", delay)
+    return time.time() + delay
+
+# Scheduling
+def quiet_until(timestamp, start, end):
+    """End of the quiet window [start, end) (local hours) containing `timestamp`, or `timestamp` itself."""
+    moment = datetime.fromtimestamp(timestamp)
+    hour = moment.hour
+    inside = start <= hour < end if start < end else (hour >= start or hour < end)
+    if not inside:
+        return timestamp
+    until = moment.replace(hour=end, minute=0, second=0, microsecond=0)
+    if until <= moment:
+        until += timedelta(days=1)
+    return until.timestamp()
+
+def next_allowed(group, now=None):
+    """Earliest time a group accepts another post: slow mode / owner interval since the last post, then quiet hours."""
+    ready = time.time() if now is None else now
+    gap = max(group.get("slowmode", 0), group.get("interval", 0))
+    last_sent = group_stats.get(group["id"], {}).get("last_sent")
+    if gap and last_sent:
+        ready = max(ready, last_sent + gap)
+    if group.get("quiet"):
+        ready = quiet_until(ready, *group["quiet"])
+    return ready
+
+# Dispatch engine
+# Satu jalur kirim untuk .start, .forwardonce dan .autoforward. Payload berupa
+# {"kind": "template", "index": i} atau {"kind": "forward", "message": Message}.
+recent_results = deque(maxlen=1000)
+
+def make_result(group, payload, outcome, latency=0.0, error=None, wait=0):
+    """Build the result record of one delivery attempt."""
+    return {
+        "peer_id": group["id"],
+        "name": group["name"],
+        "event_type": "MSG" if payload["kind"] == "template" else "FWD",
+        "outcome": outcome,
+        "latency": latency,
+        "error": type(error).__name__ if error else None,
+        "detail": str(error) if error else None,
+        "wait": wait,
+        "time": time.time(),
+    }
+
+def record_result(result):
+    """Feed a result into the per-group stats, metrics, the log and recent_results."""
+    recent_results.append(result)
+    outcome = result["outcome"]
+    metrics.inc("deliveries_total", kind="send" if result["event_type"] == "MSG" else "forward", outcome=outcome)
+    if outcome == "flood":
+        metrics.inc("floodwait_seconds_total", result["wait"])
+    elif outcome != "skipped":
+        metrics.observe("rpc_latency_seconds", result["latency"])
+    if outcome == "skipped":
+        return
+    if outcome == "flood":
+        log_event("FLOOD", result["wait"], group_name=result["name"], group_id=result["peer_id"])
+        return
+    if outcome == "slowmode":
+        log_event("SLOWMODE", result["wait"], group_name=result["name"], group_id=result["peer_id"])
+        return
+
+    record_delivery(result)
+    if outcome == "ok":
+        log_event(result["event_type"], group_name=result["name"], group_id=result["peer_id"], latency=result["latency"])
+    else:
+        log_event(
+            "FAIL", result["detail"], group_name=result["name"], group_id=result["peer_id"],
+            latency=result["latency"], error=result["error"],
+        )
+
+def summarize_results(results):
+    """Count results by outcome, e.g. {"ok": 40, "failed": 2}."""
+    counts = {}
+    for result in results:
+        counts[result["outcome"]] = counts.get(result["outcome"], 0) + 1
+    return counts
+
+async def send_payload(peer, payload):
+    """Send a template or forward a source message to a resolved peer."""
+    if payload["kind"] == "template":
+        await send_template(peer, payload["index"])
+    else:
+        await client.forward_messages(peer, payload["message"])
 
+async def deliver(group, payload):
+    """Resolve a group, deliver the payload once and return a classified result record.
 
-# Initialize data
-load_data()
+    Outcomes: "ok", "failed", "quarantined", or "flood"/"slowmode" with `wait`
+    set to the number of seconds Telegram asked us to wait.
+    """
+    started = time.perf_counter()
+    error, wait = None, 0
+    try:
+        peer = await resolve_peer(group)
+        await send_payload(peer, payload)
+        outcome = "ok"
+    except FloodWaitError as e:
+        outcome, error, wait = "flood", e, e.seconds
+    except SlowModeWaitError as e:
+        outcome, error, wait = "slowmode", e, e.seconds
+    except QUARANTINE_ERRORS as e:
+        outcome, error = "quarantined", e
+        quarantine_group(group, e)
+    except (ChannelPrivateError, PeerIdInvalidError) as e:
+        outcome, error = "failed", e
+        invalidate_peer(group)
+    except ConnectionError:
+        # Bukan kesalahan grup: biarkan job berhenti dan dijalankan ulang oleh supervisor setelah tersambung lagi
+        raise
+    except Exception as e:
+        outcome, error = "failed", e
+
+    if outcome == "ok":
+        release_quarantine(group)
+    result = make_result(group, payload, outcome, time.perf_counter() - started, error, wait)
+    record_result(result)
+    return result
+
+async def dispatch(payload, targets, state, progress=None):
+    """Deliver a payload to every target from the job's checkpoint; returns one result per target.
+
+    Targets sit in a heap keyed on their next allowed post time (slow mode,
+    owner interval, quiet hours). The loop sleeps until the later of that time
+    and the global random delay, so no delay slot is spent on a group that
+    would reject the post. FloodWait pauses the whole run and retries the same
+    target; quarantined, left or blocked groups (see scan_groups) and groups
+    not due within BREAK_DELAY are skipped.
+    """
+    results = []
+    started = time.time()
+    # .hapus, .whitelist dan reload konfigurasi mengubah group_ids di tempat selama job menunggu;
+    # putaran ini memakai salinan dan checkpoint dicatat per id grup
+    live = targets is group_ids
+    targets = list(targets)
+    position = resume_position(state, targets)
+    done = set(state.get("done", ()))
+    heartbeat(progress)
+    if HEALTH_SCAN and position == 0 and not done and targets:
+        await scan_groups(targets)
+
+    # handled: id target setelah cursor yang sudah selesai di putaran ini (urutan heap bisa melompat)
+    handled = {group["id"] for group in targets[position:] if group["id"] in done}
+    pending = [index for index in range(position, len(targets)) if targets[index]["id"] not in handled]
+    if progress is not None:
+        progress.update(total=len(pending), done=0, sent=0, failed=0, skipped=0, started=time.time())
+
+    def finish(group):
+        nonlocal position
+        handled.add(group["id"])
+        while position < len(targets) and targets[position]["id"] in handled:
+            handled.discard(targets[position]["id"])
+            position += 1
+        checkpoint(state, position, targets, handled)
+
+    queue = []
+    now = time.time()
+    for index in pending:
+        group = targets[index]
+        ready_at = next_allowed(group, now)
+        if is_usable(group) and ready_at - now <= BREAK_DELAY:
+            heapq.heappush(queue, (ready_at, index, group))
+            continue
+        # Tidak bisa dikirimi, atau baru boleh dikirimi setelah jeda sesi: lewati putaran ini
+        result = make_result(group, payload, "skipped")
+        record_result(result)
+        results.append(result)
+        finish(group)
+        await report_progress(progress, "skipped")
+
+    send_after = time.time()
+    while queue:
+        ready_at, index, group = heapq.heappop(queue)
+        wait = max(0, max(ready_at, send_after) - time.time())
+        heartbeat(progress, wait)
+        await asyncio.sleep(wait)
+        if live:
+            # Reload data membuat dict grup baru: cocokkan per id dan kirim memakai entry terkini
+            group = group_index.get(group["id"], group)
+        if not is_usable(group) or (live and group["id"] not in group_index):
+            # Dikarantina oleh job lain atau dihapus dari daftar selama menunggu
+            result = make_result(group, payload, "skipped")
+            record_result(result)
+            results.append(result)
+            finish(group)
+            await report_progress(progress, "skipped")
+            continue
+
+        result = await deliver(group, payload)
+        while result["outcome"] == "flood":
+            # Seluruh job berhenti tepat selama FloodWait, lalu grup yang sama dicoba lagi
+            heartbeat(progress, result["wait"])
+            await asyncio.sleep(result["wait"])
+            result = await deliver(group, payload)
+        if result["outcome"] == "slowmode":
+            heapq.heappush(queue, (time.time() + result["wait"], index, group))
+            continue
+        results.append(result)
+        finish(group)
+        await report_progress(progress, result["outcome"])
+        if result["outcome"] in ("ok", "failed"):
+            send_after = pace()
+
+    counts = summarize_results(results)
+    metrics.observe("cycle_duration_seconds", time.time() - started)
+    log_event("CYCLE", ", ".join(f"{count} {outcome}" for outcome, count in counts.items()) or "no targets")
+    return results
 
 # Helper Functions
-async def send_messages():
+async def send_messages(resume=None, progress=None):
     """Send the selected message to all group IDs with delay."""
     if not messages:
         return "No messages to send. Add a message first."
     if not group_ids:
         return "No group IDs available. Add a group first."
 
-    selected_message = messages[selected_message_index]
-    log_event(f"Using selected message: {selected_message}")
+    state = resume or {"kind": "send", "message_index": selected_message_index, "cursor": 0, "break_until": None}
+    job_state["send"] = state
+    save_data("jobs")
+
+    payload = {"kind": "template", "index": state["message_index"]}
+    log_event("SESSION", f"Using selected message: {message_preview(messages[payload['index']])}")
     while True:
-        log_event("Starting a new sending session...")
-        for group_id in group_ids:
-            try:
-                log_event(f"Sending to group {group_id}: {selected_message}")
-                peer = await client.get_entity(group_id['id']) 
-                await client.send_message(peer, selected_message, parse_mode='HTML')
-                log_event("MSG", None, group_name=group_id['name'], group_id=group_id['id'])
-            except Exception as e:
-                log_event("Error sending message", group_id['name'], str(e))
-            delay = random.randint(DELAY_MIN, DELAY_MAX)
-            log_event("DELAY", delay)
-            await asyncio.sleep(delay)
-        log_event("BREAK", BREAK_DELAY // 3600)  # Jam
-        await asyncio.sleep(BREAK_DELAY)
-
-async def forward_message_once(reply_message):
+        await wait_break(state, progress)
+        log_event("SESSION", "Starting a new sending session...")
+        await dispatch(payload, group_ids, state, progress)
+        await start_break(state, progress)
+
+async def forward_message_once(reply_message, state_key, progress=None, resume=None):
     """Forward a message once to all groups."""
-    for group_id in group_ids:
+    state = resume or {
+        "kind": "forwardonce",
+        "chat_id": reply_message.chat_id,
+        "msg_id": reply_message.id,
+        "cursor": 0,
+        "message": progress["message"] if progress else None,
+    }
+    job_state[state_key] = state
+    save_data("jobs")
+
+    results = await dispatch({"kind": "forward", "message": reply_message}, group_ids, state, progress)
+    clear_job(state_key)
+    await edit_progress(progress, f"Message forwarded once to all groups: {format_progress(progress)}.")
+    return results
+
+def start_forward_once(reply_message, message=None, resume=None):
+    """Run a one-shot forward as a tracked background job and return its job id."""
+    state_key = f"forwardonce:{reply_message.chat_id}:{reply_message.id}"
+    progress = new_progress("Forward-once", message)
+    progress["total"] = len(group_ids)
+    job = start_job(
+        "forwardonce", lambda resume: forward_message_once(reply_message, state_key, progress, resume),
+        progress, state_key, resume,
+    )
+    progress["label"] = f"Forward-once #{job['id']}"
+    return job["id"]
+
+async def auto_forward_message(reply_message, resume=None, progress=None):
+    """Continuously forward a message with delay."""
+    state = resume or {
+        "kind": "autoforward",
+        "chat_id": reply_message.chat_id,
+        "msg_id": reply_message.id,
+        "cursor": 0,
+        "break_until": None,
+    }
+    job_state["autoforward"] = state
+    save_data("jobs")
+
+    payload = {"kind": "forward", "message": reply_message}
+    while True:
+        await wait_break(state, progress)
+        log_event("SESSION", "Starting auto-forward session...")
+        await dispatch(payload, group_ids, state, progress)
+        await start_break(state, progress)
+
+async def resume_jobs():
+    """Restart jobs that were running before the last restart/crash from their checkpoint."""
+    global task, forward_task
+    state = job_state.get("send")
+    if state:
+        if 0 <= state.get("message_index", -1) < len(messages):
+            progress = new_progress("Sending")
+            # progress diikat sebagai default: variabel yang sama dipakai lagi untuk auto-forward di bawah
+            task = start_job(
+                "send", lambda resume, progress=progress: send_messages(resume=resume, progress=progress), progress, resume=state,
+            )["task"]
+            log_action("RESUME", f"Sending resumed at group #{resume_position(state) + 1}", "SUCCESS")
+        else:
+            clear_job("send")
+
+    state = job_state.get("autoforward")
+    if state:
         try:
-            peer = await client.get_entity(group_id['id'])
-            await client.forward_messages(peer, reply_message)
-            log_event("FWD", None, group_name=group_id['name'], group_id=group_id['id'])
+            reply_message = await client.get_messages(state["chat_id"], ids=state["msg_id"])
         except Exception as e:
-            log_event("Error forwarding message", group_id['name'], str(e))
-        delay = random.randint(DELAY_MIN, DELAY_MAX)
-        log_event("DELAY", delay)
-        await asyncio.sleep(delay)
+            log_action("RESUME", f"Failed to fetch auto-forward source: {e}", "ERROR")
+            reply_message = None
+        if reply_message is not None:
+            progress = new_progress("Auto-forward")
+            forward_task = start_job(
+                "autoforward",
+                lambda resume, progress=progress, reply_message=reply_message: auto_forward_message(
+                    reply_message, resume=resume, progress=progress
+                ),
+                progress, resume=state,
+            )["task"]
+            log_action("RESUME", f"Auto-forward resumed at group #{resume_position(state) + 1}", "SUCCESS")
+        else:
+            clear_job("autoforward")
 
-async def auto_forward_message(reply_message):
-    """Continuously forward a message with delay."""
-    while True:
-        log_event("Starting auto-forward session...")
-        for group_id in group_ids:
-            try:
-                peer = await client.get_entity(group_id['id'])
-                await client.forward_messages(peer, reply_message)
-                log_event("FWD", None, group_name=group_id['name'], group_id=group_id['id'])
-            except Exception as e:
-                log_event(f"Failed to forward to {group_id}: {e}")
-            delay = random.randint(DELAY_MIN, DELAY_MAX)
-            log_event("DELAY", delay)
-            await asyncio.sleep(delay)
-        log_event("BREAK", BREAK_DELAY // 3600)  # Jam
-        await asyncio.sleep(BREAK_DELAY)
+    for state_key, state in list(job_state.items()):
+        if not state_key.startswith("forwardonce:"):
+            continue
+        try:
+            reply_message = await client.get_messages(state["chat_id"], ids=state["msg_id"])
+        except Exception as e:
+            log_action("RESUME", f"Failed to fetch forward-once source: {e}", "ERROR")
+            reply_message = None
+        if reply_message is not None:
+            message = tuple(state["message"]) if state.get("message") else None
+            job_id = start_forward_once(reply_message, message, resume=state)
+            log_action("RESUME", f"Forward-once #{job_id} resumed at group #{resume_position(state) + 1}", "SUCCESS")
+        else:
+            clear_job(state_key)
+
+# Command Router
+# Satu handler untuk semua pesan keluar; perintah dicari di dict (exact match)
+COMMANDS = {}
+router_stats = {"dispatched": 0, "rejected": 0}
+
+def command(name, pattern=None):
+    """Register a coroutine as the handler for an exact command name."""
+    def decorator(func):
+        COMMANDS[name] = (func, re.compile(pattern) if pattern else None)
+        return func
+    return decorator
+
+@client.on(events.NewMessage(outgoing=True))
+async def route_command(event):
+    """Dispatch outgoing `.command args` messages to their registered handler."""
+    text = event.raw_text
+    if not text or text[0] != ".":
+        router_stats["rejected"] += 1
+        return
+
+    parts = text.split(maxsplit=1)
+    entry = COMMANDS.get(parts[0])
+    if entry is None:
+        router_stats["rejected"] += 1
+        return
+
+    handler, pattern = entry
+    if pattern is not None:
+        # Handler lama tetap membaca argumen lewat event.pattern_match
+        event.pattern_match = pattern.fullmatch(parts[1].strip()) if len(parts) > 1 else None
+        if event.pattern_match is None:
+            router_stats["rejected"] += 1
+            return
+
+    router_stats["dispatched"] += 1
+    await data_ready.wait()
+    started = time.perf_counter()
+    try:
+        await handler(event)
+    finally:
+        metrics.observe("handler_seconds", time.perf_counter() - started, command=parts[0])
+        if "first command" not in startup_times:
+            mark_startup("first command")
+            downtime = f" ({format_seconds(time.time() - RESTARTED_AT)} since .restart)" if RESTARTED_AT else ""
+            log_action("STARTUP", f"First command {parts[0]} handled {format_seconds(startup_times['first command'])} after start{downtime}", "SUCCESS")
+
+# Dialog index updates
+@client.on(events.ChatAction)
+async def track_chat_action(event):
+    """Keep the dialog index in sync with our joins/leaves and with title changes."""
+    await data_ready.wait()
+    if event.new_title:
+        if event.chat_id in dialog_index:
+            dialog_index.update(event.chat_id, event.new_title)
+            save_data("dialogs")
+        return
+    if not (event.created or event.user_joined or event.user_added or event.user_left or event.user_kicked):
+        return
+    if not event.created and await client.get_peer_id("me") not in event.user_ids:
+        return
+
+    if event.user_left or event.user_kicked:
+        if dialog_index.remove(event.chat_id):
+            save_data("dialogs")
+        return
+    chat = await event.get_chat()
+    if is_group_entity(chat):
+        dialog_index.update(event.chat_id, chat.title, peer_to_dict(utils.get_input_peer(chat)))
+        save_data("dialogs")
+
+# Channel dari UpdateChannel yang entity-nya tidak ikut terkirim, dicek bersama setelah CHANNEL_UPDATE_DELAY
+channel_updates = set()
+channel_update_task = None
+
+def apply_channel_update(chat_id, chat):
+    """Add, rename or drop a supergroup in the dialog index from its current entity."""
+    if chat is None or getattr(chat, "left", False) or not is_group_entity(chat):
+        if dialog_index.remove(chat_id):
+            save_data("dialogs")
+        return
+    dialog_index.update(chat_id, chat.title, peer_to_dict(utils.get_input_peer(chat)))
+    save_data("dialogs")
+
+def known_channel(chat_id):
+    """InputChannel for a supergroup we already track (dialog index or group list), else None."""
+    entry = dialog_index.get(chat_id) if chat_id in dialog_index else group_index.get(chat_id)
+    peer = peer_cache.get(chat_id) or peer_from_dict(entry and entry.get("peer"))
+    if isinstance(peer, InputPeerChannel):
+        return InputChannel(peer.channel_id, peer.access_hash)
+    return None
+
+async def flush_channel_updates():
+    """Look up every queued channel with one GetChannels per SCAN_BATCH ids."""
+    global channel_update_task
+    await asyncio.sleep(CHANNEL_UPDATE_DELAY)
+    channel_update_task = None
+    pending = {chat_id: known_channel(chat_id) for chat_id in channel_updates}
+    channel_updates.clear()
+    items = [(chat_id, channel) for chat_id, channel in pending.items() if channel is not None]
+    for start in range(0, len(items), SCAN_BATCH):
+        batch = items[start:start + SCAN_BATCH]
+        try:
+            result = await client(GetChannelsRequest([channel for _, channel in batch]))
+        except Exception as e:
+            log_action("DIALOG INDEX", f"Failed to refresh {len(batch)} channels: {e}", "ERROR")
+            continue
+        found = {utils.get_peer_id(chat): chat for chat in result.chats}
+        for chat_id, _ in batch:
+            apply_channel_update(chat_id, found.get(chat_id))
+
+@client.on(events.Raw(UpdateChannel))
+async def track_channel_update(update):
+    """Refresh a supergroup's index entry when Telegram reports it changed (join, leave, rename)."""
+    global channel_update_task
+    await data_ready.wait()
+    chat_id = utils.get_peer_id(PeerChannel(update.channel_id))
+    # Telethon menempelkan entity yang ikut dalam update; biasanya channel-nya ada di situ
+    chat = getattr(update, "_entities", {}).get(chat_id)
+    if chat_id not in dialog_index and chat_id not in group_index:
+        # Channel yang tidak dilacak (mis. broadcast) diabaikan, kecuali kita baru bergabung ke grup
+        if chat is not None and is_group_entity(chat) and not getattr(chat, "left", False):
+            apply_channel_update(chat_id, chat)
+        return
+    if chat is not None:
+        apply_channel_update(chat_id, chat)
+        return
+    channel_updates.add(chat_id)
+    if channel_update_task is None:
+        channel_update_task = asyncio.create_task(flush_channel_updates())
 
 # Event Handlers
-@client.on(events.NewMessage(pattern=r"\.addgroupid (\d+)"))
+@command(".addgroupid", r"(-?\d+)")
 async def handle_add_group(event):
     group_id = int(event.pattern_match.group(1))
     try:
-        # Ambil informasi nama grup berdasarkan ID
-        group_entity = await client.get_entity(group_id)
-        group_name = group_entity.title
+        # Ambil informasi nama grup berdasarkan ID (dari index jika ada, tanpa RPC)
+        indexed = dialog_index.get(group_id)
+        if indexed is not None:
+            group_name, peer = indexed["title"], indexed["peer"]
+        else:
+            group_entity = await client.get_entity(group_id)
+            group_name, peer = group_entity.title, peer_to_dict(utils.get_input_peer(group_entity))
 
         # Tambahkan grup ke daftar jika belum ada
-        if not any(group['id'] == group_id for group in group_ids):
-            group_ids.append({"id": group_id, "name": group_name})
-            save_data()
+        if add_group_entry(group_id, group_name, peer):
+            save_data("groups")
             await event.edit(f"Group {group_name} (ID: {group_id}) added.")
             print(f"Group {group_name} (ID: {group_id}) added.")
         else:
@@ -245,124 +1440,313 @@ async def handle_add_group(event):
         await event.edit(f"Failed to add group: {e}")
     print(f"Group ID handled: {group_id}")
 
-@client.on(events.NewMessage(pattern=r"\.addgroup (.+)"))
+@command(".addgroup", r"(.+)")
 async def add_group_by_name(event):
     group_name = event.pattern_match.group(1)
     try:
-        async for dialog in client.iter_dialogs():
-            if dialog.is_group and dialog.title == group_name:
-                if not any(group['id'] == dialog.id for group in group_ids):
-                    group_ids.append({"id": dialog.id, "name": dialog.title})
-                    save_data()
-                    await event.edit(f"Group {group_name} (ID: {dialog.id}) added.")
-                    print(f"Group {group_name} (ID: {dialog.id}) added.")
-                    return
-                else:
-                    await event.edit("Group already exists in the list.")
-                    return
-        await event.edit("Group not found.")
+        if not dialog_index:
+            await build_dialog_index()
+        matches, kind = dialog_index.find(group_name)
+        if not matches:
+            await event.edit("Group not found.")
+        elif len(matches) == 1 and kind != "fuzzy":
+            chat_id = matches[0]
+            entry = dialog_index.get(chat_id)
+            if add_group_entry(chat_id, entry["title"], entry["peer"]):
+                save_data("groups")
+                await event.edit(f"Group {entry['title']} (ID: {chat_id}) added.")
+                print(f"Group {entry['title']} (ID: {chat_id}) added.")
+            else:
+                await event.edit("Group already exists in the list.")
+        else:
+            header = "Did you mean one of these groups?" if kind == "fuzzy" else "Multiple groups match that name:"
+            response = "\n".join([
+                f"{i + 1}. {dialog_index.get(chat_id)['title']} (ID: {chat_id})" for i, chat_id in enumerate(matches)
+            ])
+            await event.edit(f"{header}\n{response}\nUse .addgroupid <id> to add one of them.")
     except Exception as e:
         await event.edit(f"Failed to add group: {e}")
     print(f"Group added by name: {group_name}")
 
-@client.on(events.NewMessage(pattern=r"\.hapus ([\d,-]+)"))
+@command(".hapus", r"([\d,-]+)")
 async def delete_groups(event):
     """Delete multiple groups by indices."""
     indices = event.pattern_match.group(1)
     try:
         # Parsing input (e.g., "1,3-5" -> [1, 3, 4, 5])
         indices = parse_indices(indices)
-        removed_groups = []
-        
-        for index in sorted(indices, reverse=True):
-            if 0 <= index - 1 < len(group_ids):
-                removed_groups.append(group_ids.pop(index - 1))
-        
-        save_data()
+        removed_groups = take_by_indices(group_ids, indices)
+        for group in removed_groups:
+            group_index.pop(group["id"], None)
+
+        save_data("groups")
         response = "\n".join([f"Removed: {group['name']} (ID: {group['id']})" for group in removed_groups])
         await event.edit(f"Successfully removed the following groups:\n{response}")
     except Exception as e:
         await event.edit(f"Error removing groups: {e}")
     print("Deleted multiple groups.")
 
-@client.on(events.NewMessage(pattern=r"\.tambahpesan"))
+@command(".tambahpesan")
 async def handle_add_message(event):
     if event.reply_to_msg_id:
         reply = await event.get_reply_message()
-        message = reply.text
+        # Simpan sebagai HTML agar format (entities) ikut tersimpan
+        message = html.unparse(reply.message or "", reply.entities or [])
+        if reply.media and not isinstance(reply.media, MessageMediaWebPage):
+            try:
+                input_media = utils.get_input_media(reply.media)
+            except TypeError:
+                await event.edit("This kind of media can't be stored as a message.")
+                return
+            message = {
+                "text": message,
+                "media": {"chat_id": reply.chat_id, "msg_id": reply.id, "input": encode_tl(input_media)},
+            }
         if message:
             messages.append(message)
-            save_data()
+            templates.append(compile_message(message))
+            save_data("messages")
             await event.edit("Message added successfully.")
-            print(f"Message added: {message}")
+            print(f"Message added: {message_preview(message)}")
         else:
             await event.edit("Replied message is empty or not text.")
     else:
         await event.edit("Reply to a message to add it.")
 
-@client.on(events.NewMessage(pattern=r"\.grup"))
+# Listings
+def chunk_lines(lines, limit=MESSAGE_LIMIT, separator="\n"):
+    """Lazily group lines into texts that each fit in one Telegram message."""
+    chunk, size = [], 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[:limit - 1] + "…"
+        if chunk and size + len(separator) + len(line) > limit:
+            yield separator.join(chunk)
+            chunk, size = [], 0
+        size += len(line) + (len(separator) if chunk else 0)
+        chunk.append(line)
+    if chunk:
+        yield separator.join(chunk)
+
+def listing_mode(event, skip=()):
+    """Read the listing argument of a command: a page number, "all", "file" or None."""
+    for arg in event.raw_text.split()[1:]:
+        if arg in skip:
+            continue
+        if arg.isdigit() or arg in ("all", "file"):
+            return arg
+    return None
+
+async def send_listing(event, title, items, format_item, mode=None, per_page=LIST_PAGE_SIZE, separator="\n", filename="list.txt"):
+    """Show one page of a listing, every page as follow-up messages ("all") or a text document ("file").
+
+    Lines are formatted lazily from `items`, so only the page (or chunk) being
+    sent is ever held as a string.
+    """
+    total = len(items)
+    command_name = event.raw_text.split()[0]
+    if mode == "file":
+        buffer = io.BytesIO()
+        for i, item in enumerate(items):
+            buffer.write(format_item(i, item).encode() + b"\n")
+        buffer.seek(0)
+        buffer.name = filename
+        await event.edit(f"{title} {total} item(s), sent as {filename}.")
+        await event.respond(file=buffer)
+        return
+
+    if mode == "all":
+        lines = (format_item(i, item) for i, item in enumerate(items))
+        header = f"{title} {total} item(s):"
+    else:
+        pages = max(1, -(-total // per_page))
+        page = min(max(int(mode or 1), 1), pages)
+        start = (page - 1) * per_page
+        lines = (format_item(i, item) for i, item in enumerate(items[start:start + per_page], start))
+        header = f"{title} page {page}/{pages} ({total} total):"
+        if page < pages:
+            header += f"\nNext: {command_name} {page + 1} | all: {command_name} all | document: {command_name} file"
+
+    # Pesan pertama menggantikan perintah, sisanya dikirim sebagai pesan lanjutan
+    first = True
+    for chunk in chunk_lines(lines, MESSAGE_LIMIT - len(header) - len(separator), separator):
+        if first:
+            await event.edit(f"{header}{separator}{chunk}")
+            first = False
+        else:
+            await event.respond(chunk)
+
+def format_group(i, group):
+    return f"{i + 1}. {group['name']} (ID: {group['id']})" + group_flags(group)
+
+def group_flags(group):
+    """Suffix shown after a group in listings: [left], [blocked reason], [slow mode]."""
+    flags = ""
+    if group.get("left"):
+        flags += " [left]"
+    if group.get("blocked"):
+        flags += f" [{group['blocked']}]"
+    if group.get("slowmode"):
+        flags += f" [slow mode {group['slowmode']}s]"
+    if group.get("interval"):
+        flags += f" [every {group['interval'] // 60}m]"
+    if group.get("quiet"):
+        flags += " [quiet {:02d}-{:02d}]".format(*group["quiet"])
+    return flags
+
+@command(".grup")
 async def handle_list_group_ids(event):
     """List saved groups with names and IDs from groups.json."""
     if group_ids:
-        response = "\n".join([f"{i + 1}. {group['name']} (ID: {group['id']})" for i, group in enumerate(group_ids)])
-        await event.edit(f"Groups in list:\n{response}")
+        await send_listing(event, "Groups in list:", group_ids, format_group, listing_mode(event), filename="groups.txt")
     else:
         await event.edit("No groups found in the group list.")
     print("Listed saved group names and IDs.")
 
-@client.on(events.NewMessage(pattern=r"\.grupall"))
+@command(".grupall")
 async def handle_list_all_groups(event):
-    """List all groups and save their names and IDs to groups.json."""
-    global group_ids
-    group_ids = []  # Clear existing list
-
-    async for dialog in client.iter_dialogs():
-        if dialog.is_group:  # Check if it's a group
-            group_entry = {"id": dialog.id, "name": dialog.title}
-            if group_entry not in group_ids:
-                group_ids.append(group_entry)
-
-    # Save updated group list
-    save_data()
-
+    """Sync the group list with the account's groups without losing order, names or whitelist."""
+    # Grup hanya ditandai keluar berdasarkan crawl dari proses ini: sejak itu index dijaga
+    # oleh update join/leave, sedangkan snapshot dari disk bisa ketinggalan hingga sehari.
+    # `.grupall refresh` tetap memaksa crawl ulang
+    stale = dialog_index.built_at is None or dialog_index.built_at < START_TIME
+    if stale or event.raw_text.split()[1:] == ["refresh"]:
+        await build_dialog_index()
+
+    added = removed = unchanged = 0
+    for group in group_ids:
+        if group["id"] in dialog_index:
+            if group.pop("left", False):
+                added += 1  # bergabung lagi
+            else:
+                unchanged += 1
+            if "peer" not in group and dialog_index.get(group["id"])["peer"]:
+                group["peer"] = dialog_index.get(group["id"])["peer"]
+        elif not group.get("left"):
+            group["left"] = True
+            removed += 1
+
+    # Grup baru ditambahkan di akhir; grup di whitelist tetap dikecualikan
+    for chat_id, entry in dialog_index.entries.items():
+        if chat_id not in whitelist_index and add_group_entry(chat_id, entry["title"], entry["peer"]):
+            added += 1
+
+    if added or removed:
+        save_data("groups")
+
+    summary = f"Sync: {added} added, {removed} removed, {unchanged} unchanged."
     if group_ids:
-        response = "\n".join([f"{i + 1}. {group['name']} (ID: {group['id']})" for i, group in enumerate(group_ids)])
-        await event.edit(f"All Groups (Updated List):\n{response}")
+        mode = listing_mode(event, skip=("refresh",))
+        await send_listing(event, f"{summary}\nAll Groups (Updated List):", group_ids, format_group, mode, filename="groups.txt")
     else:
-        await event.edit("No groups found on this account.")
-    print("Listed all groups with names.")
+        await event.edit(f"{summary}\nNo groups found on this account.")
+    print(f"Synced all groups. {summary}")
+
+@command(".cekgrup")
+async def handle_check_groups(event):
+    """Check all groups in batched requests and mark the ones that cannot accept a post."""
+    if not group_ids:
+        await event.edit("No groups found in the group list.")
+        return
+    await event.edit(f"Checking {len(group_ids)} groups...")
+    report = await scan_groups(group_ids)
+    unusable = [
+        f"{i + 1}. {group['name']} (ID: {group['id']})" + group_flags(group)
+        for i, group in enumerate(group_ids)
+        if group.get("left") or group.get("blocked")
+    ]
+    slow = sum(1 for group in group_ids if group.get("slowmode"))
+    summary = (
+        f"Checked {report['checked']}/{len(group_ids)} groups in {report['requests']} requests: "
+        f"{len(group_ids) - len(unusable)} usable, {len(unusable)} skipped, {slow} with slow mode"
+        + (f", {report['unresolved']} unresolved." if report["unresolved"] else ".")
+    )
+    if not unusable:
+        await event.edit(summary)
+        return
+    # Daftar panjang dipecah menjadi beberapa pesan
+    for n, chunk in enumerate(chunk_lines(unusable, MESSAGE_LIMIT - len(summary) - 10)):
+        if n == 0:
+            await event.edit(f"{summary}\nSkipped:\n{chunk}")
+        else:
+            await event.respond(chunk)
 
-@client.on(events.NewMessage(pattern=r"\.pesan"))
+@command(".jadwal", r"([\d,-]+)\s+(interval\s+\d+|quiet\s+\d{1,2}-\d{1,2}|reset)")
+async def set_group_schedule(event):
+    """Set a per-group minimum interval (minutes) or quiet hours, or reset both."""
+    try:
+        indices = parse_indices(event.pattern_match.group(1))
+    except ValueError:
+        await event.edit("Invalid group numbers.")
+        return
+    setting = event.pattern_match.group(2).split()
+    selected = [group_ids[i - 1] for i in indices if 1 <= i <= len(group_ids)]
+    if not selected:
+        await event.edit("No valid group numbers provided.")
+        return
+
+    if setting[0] == "interval":
+        minutes = int(setting[1])
+        for group in selected:
+            if minutes:
+                group["interval"] = minutes * 60
+            else:
+                group.pop("interval", None)
+        summary = f"minimum interval {minutes}m" if minutes else "interval removed"
+    elif setting[0] == "quiet":
+        start, end = map(int, setting[1].split("-"))
+        if not (0 <= start < 24 and 0 <= end < 24) or start == end:
+            await event.edit("Quiet hours must be two different hours between 0 and 23, e.g. 22-6.")
+            return
+        for group in selected:
+            group["quiet"] = [start, end]
+        summary = f"quiet hours {start:02d}:00-{end:02d}:00"
+    else:
+        for group in selected:
+            group.pop("interval", None)
+            group.pop("quiet", None)
+        summary = "schedule reset"
+    save_rows("groups", *(group["id"] for group in selected))
+    await event.edit(f"{len(selected)} group(s): {summary}.")
+
+@command(".pesan")
 async def handle_list_messages(event):
     if messages:
-        response = "\n\n".join([f"**{i + 1}.** {msg}" for i, msg in enumerate(messages)])
-        await event.edit(f"Messages:\n\n{response}")
+        mode = listing_mode(event)
+        # Preview dipotong di chat; dokumen berisi teks lengkap
+        limit = None if mode == "file" else PREVIEW_CHARS
+        await send_listing(
+            event, "Messages:", messages,
+            lambda i, msg: f"**{i + 1}.** {message_preview(msg, limit)}",
+            mode, per_page=MESSAGE_PAGE_SIZE, separator="\n\n", filename="messages.txt",
+        )
     else:
         await event.edit("No messages available.")
     print("Listed messages.")
 
-@client.on(events.NewMessage(pattern=r"\.selectmessage (\d+)"))
+@command(".selectmessage", r"(\d+)")
 async def handle_select_message(event):
     global selected_message_index
     index = int(event.pattern_match.group(1)) - 1
     if 0 <= index < len(messages):
         selected_message_index = index
-        await event.edit(f"Message #{index + 1} selected: {messages[index]}")
+        await event.edit(f"Message #{index + 1} selected: {message_preview(messages[index])}")
     else:
         await event.edit("Invalid message index.")
     print(f"Selected message index: {index}")
 
-@client.on(events.NewMessage(pattern=r"\.start"))
+@command(".start")
 async def start_sending(event):
     global task
     if task and not task.done():
         await event.edit("Message sending is already in progress.")
     else:
-        task = asyncio.create_task(send_messages())
+        progress = new_progress("Sending")
+        task = start_job("send", lambda resume: send_messages(resume=resume, progress=progress), progress)["task"]
         await event.edit("Started sending messages.")
     print("Started message sending.")
 
-@client.on(events.NewMessage(pattern=r"\.stop"))
+@command(".stop")
 async def stop_sending(event):
     global task
     if task and not task.done():
@@ -372,21 +1756,22 @@ async def stop_sending(event):
         except asyncio.CancelledError:
             print("Message sending stopped by user.")
         task = None
+        clear_job("send")
         await event.edit("Message sending process stopped and logged.")
     else:
         await event.edit("No active message-sending process.")
     print("Stopped message sending.")
 
-@client.on(events.NewMessage(pattern=r"\.forwardonce"))
+@command(".forwardonce")
 async def handle_forward_once(event):
     if event.reply_to_msg_id:
         reply_message = await event.get_reply_message()
-        await forward_message_once(reply_message)
-        await event.edit("Message forwarded once to all groups.")
+        job_id = start_forward_once(reply_message, (event.chat_id, event.id))
+        await event.edit(f"Forward-once #{job_id} started for {len(group_ids)} groups. Use .cancel {job_id} to stop it.")
     else:
         await event.edit("Reply to a message to forward it.")
 
-@client.on(events.NewMessage(pattern=r"\.autoforward"))
+@command(".autoforward")
 async def handle_auto_forward(event):
     global forward_task
     if forward_task and not forward_task.done():
@@ -394,14 +1779,21 @@ async def handle_auto_forward(event):
     else:
         if event.reply_to_msg_id:
             reply_message = await event.get_reply_message()
-            forward_task = asyncio.create_task(auto_forward_message(reply_message))
+            progress = new_progress("Auto-forward")
+            forward_task = start_job(
+                "autoforward", lambda resume: auto_forward_message(reply_message, resume=resume, progress=progress), progress,
+            )["task"]
             await event.edit("Started auto-forwarding.")
         else:
             await event.edit("Reply to a message to auto-forward it.")
 
-@client.on(events.NewMessage(pattern=r"\.stopforward"))
+@command(".stopforward")
 async def stop_auto_forward(event):
     global forward_task
+    # Job forward-once ikut dihentikan
+    once = [job for job in jobs.values() if job["kind"] == "forwardonce"]
+    for job in once:
+        await cancel_job(job)
     if forward_task and not forward_task.done():
         forward_task.cancel()
         try:
@@ -409,42 +1801,222 @@ async def stop_auto_forward(event):
         except asyncio.CancelledError:
             print("Auto-forwarding stopped by user.")
         forward_task = None
-        await event.edit("Auto-forwarding process stopped.")
+        clear_job("autoforward")
+        await event.edit("Auto-forwarding process stopped." + (f" {len(once)} forward-once job(s) cancelled." if once else ""))
+    elif once:
+        await event.edit(f"{len(once)} forward-once job(s) cancelled.")
     else:
         await event.edit("No active auto-forwarding process.")
 
-@client.on(events.NewMessage(pattern=r"\.restart"))
+async def cancel_job(job):
+    """Cancel a tracked job, wait for it to stop and forget its checkpoint."""
+    global task, forward_task
+    job["task"].cancel()
+    try:
+        await job["task"]
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        log_action("JOB", f"Job #{job['id']} ended with an error: {e}", "ERROR")
+    if job["task"] is task:
+        task = None
+    if job["task"] is forward_task:
+        forward_task = None
+    clear_job(job["state_key"])
+    if job["progress"]:
+        await edit_progress(job["progress"], f"{job['progress']['label']} cancelled: {format_progress(job['progress'])}.")
+
+@command(".jobs")
+async def list_jobs(event):
+    """List running background jobs with their progress."""
+    if jobs:
+        response = "\n".join([
+            f"#{job['id']} {job['kind']}" + (f": {format_progress(job['progress'])}" if job["progress"] else "")
+            + f"\n  {job_health(job)}"
+            for job in jobs.values()
+        ])
+        await event.edit(f"Running jobs:\n{response}")
+    else:
+        await event.edit("No running jobs.")
+
+@command(".cancel", r"(\d+)")
+async def handle_cancel_job(event):
+    """Cancel a background job by its id."""
+    job = jobs.get(int(event.pattern_match.group(1)))
+    if job is None:
+        await event.edit("No running job with that id.")
+        return
+    await cancel_job(job)
+    await event.edit(f"Job #{job['id']} ({job['kind']}) cancelled.")
+
+@command(".restart")
 async def restart_bot(event):
     await event.edit("Restarting bot...")
-    print("Restarting bot...")
+    log_action("RESTART", "Restarting bot...", "INFO")
+
+    # Pastikan perubahan yang belum ditulis (data dan log) tidak hilang saat proses diganti
+    store.flush_now()
+    session.flush()
+    stop_logging()
+    os.environ["RESTARTED_AT"] = str(time.time())
+
+    # Interpreter yang sedang berjalan (ikut venv), bukan path yang di-hardcode
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+# Hot reload
+def reload_config():
+    """Re-read .env and apply the delay settings; returns the settings that changed."""
+    global DELAY_MIN, DELAY_MAX, BREAK_DELAY
+    load_dotenv(ENV_FILE, override=True)
+    old = {"DELAY_MIN": DELAY_MIN, "DELAY_MAX": DELAY_MAX, "BREAK_DELAY": BREAK_DELAY}
+    try:
+        # Nilai yang tidak ada di .env tetap (mis. hasil .jeda_sesi)
+        new = {name: int(os.getenv(name, value)) for name, value in old.items()}
+    except ValueError as e:
+        log_action("RELOAD", f"Invalid delay setting in .env: {e}", "ERROR")
+        return []
+    if new["DELAY_MIN"] > new["DELAY_MAX"]:
+        log_action("RELOAD", "DELAY_MIN is larger than DELAY_MAX; delay settings left unchanged", "ERROR")
+        return []
+    DELAY_MIN, DELAY_MAX, BREAK_DELAY = new["DELAY_MIN"], new["DELAY_MAX"], new["BREAK_DELAY"]
+    return [f"{name}={new[name]}" for name in old if new[name] != old[name]]
+
+def reload_data(collections=RELOADABLE):
+    """Re-read data collections from the store; pending unsaved edits to them are dropped."""
+    store.discard(*collections)
+    previous = list(messages)
+    load_lists(collections)
+    if "messages" in collections:
+        check_send_job(previous)
+    return list(collections)
+
+def check_send_job(previous):
+    """Stop the send job if a reload removed or changed the message it is posting."""
+    global task
+    state = job_state.get("send")
+    if not state:
+        return
+    index = state.get("message_index", -1)
+    if 0 <= index < len(messages) and index < len(previous) and messages[index] == previous[index]:
+        return
+    # Indeks pesan job tidak lagi menunjuk pesan yang sama: jangan kirim teks lain atau gagal ke semua grup
+    if task and not task.done():
+        task.cancel()
+    task = None
+    clear_job("send")
+    log_action("RELOAD", f"Sending stopped: message #{index + 1} was removed or changed by the reload", "ERROR")
+
+def setup_plugin(module):
+    """Register a plugin's commands; the plugin gets this module as `bot` (bot.command, bot.client, ...)."""
+    setup = getattr(module, "setup", None)
+    if setup is not None:
+        setup(sys.modules[__name__])
+
+def load_plugins():
+    """Import the modules listed in PLUGINS once at startup."""
+    for name in PLUGINS:
+        try:
+            setup_plugin(importlib.import_module(name))
+        except Exception as e:
+            log_action("PLUGIN", f"Failed to load {name}: {e}", "ERROR")
+
+def reload_plugins():
+    """Re-import the PLUGINS modules and re-register their commands; returns (reloaded, failed)."""
+    reloaded, failed = [], []
+    for name in PLUGINS:
+        # Perintah lama dari modul ini dibuang dulu supaya perintah yang dihapus ikut hilang
+        for command_name, (func, _) in list(COMMANDS.items()):
+            if func.__module__ == name:
+                del COMMANDS[command_name]
+        try:
+            module = sys.modules.get(name)
+            module = importlib.reload(module) if module is not None else importlib.import_module(name)
+            setup_plugin(module)
+            reloaded.append(name)
+        except Exception as e:
+            failed.append(f"{name} ({e})")
+            log_action("PLUGIN", f"Failed to reload {name}: {e}", "ERROR")
+    return reloaded, failed
 
-    # Log restart to a file
-    with open("restart_log.txt", "a") as log_file:
-        log_file.write("Restarting bot...\n")
-    
-    # Specify the full path for python3 on Ubuntu
-    python3_path = "/usr/bin/python3"  # Adjust if necessary
+def watched_files():
+    # Dengan backend SQLite file JSON bukan sumber data, jadi hanya .env yang dipantau
+    files = {} if isinstance(store, SqliteStore) else {name: STORE_FILES[name] for name in RELOADABLE}
+    files[".env"] = ENV_FILE
+    return files
 
-    # Use os.execv to restart the script with the correct Python 3 interpreter
-    os.execv(python3_path, [python3_path] + sys.argv)
+def file_mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
 
-@client.on(events.NewMessage(pattern=r"\.whitelist ([\d,-]+)"))
+async def watch_config():
+    """Poll the data files and .env, and apply edits made outside the bot."""
+    seen = {name: file_mtime(path) for name, path in watched_files().items()}
+    while True:
+        await asyncio.sleep(WATCH_INTERVAL)
+        changed = []
+        for name, path in watched_files().items():
+            mtime = file_mtime(path)
+            if mtime == seen.get(name):
+                continue
+            seen[name] = mtime
+            # Abaikan file yang baru saja ditulis oleh store sendiri
+            if mtime is not None and mtime != store.mtimes.get(name):
+                changed.append(name)
+        if not changed:
+            continue
+        applied = []
+        if ".env" in changed:
+            applied += reload_config()
+        collections = [name for name in changed if name in RELOADABLE]
+        if collections:
+            applied += reload_data(collections)
+        log_action("WATCH", f"Applied changes from {', '.join(changed)}: {', '.join(applied) or 'no changes'}", "SUCCESS")
+
+@command(".reload")
+async def handle_reload(event):
+    """Reload config, data and plugin modules without restarting the client."""
+    parts = event.raw_text.split()
+    target = parts[1] if len(parts) > 1 else None
+    if target not in (None, "config", "data", "plugins"):
+        await event.edit("Usage: .reload [config|data|plugins]")
+        return
+    lines = []
+    if target in (None, "config"):
+        changed = reload_config()
+        lines.append(f"Config: {', '.join(changed) or 'no changes'} (delay {DELAY_MIN}-{DELAY_MAX}s, break {BREAK_DELAY}s).")
+    if target in (None, "data"):
+        sending = "send" in job_state
+        reload_data()
+        lines.append(f"Data: {len(group_ids)} groups, {len(messages)} messages, {len(whitelist_groups)} whitelisted.")
+        if sending and "send" not in job_state:
+            lines.append("Sending stopped: its message was removed or changed.")
+    if target in (None, "plugins"):
+        if PLUGINS:
+            reloaded, failed = reload_plugins()
+            lines.append(f"Plugins: {', '.join(reloaded) or '-'} reloaded" + (f"; failed: {', '.join(failed)}." if failed else "."))
+        elif target == "plugins":
+            lines.append("No plugins configured (set PLUGINS in .env).")
+    log_action("RELOAD", " ".join(lines), "SUCCESS")
+    await event.edit("\n".join(lines))
+
+@command(".whitelist", r"([\d,-]+)")
 async def whitelisting_groups(event):
     """Whitelist multiple groups by indices."""
     indices = event.pattern_match.group(1)
     try:
         indices = parse_indices(indices)
         whitelisted_groups = []
-        
-        for index in sorted(indices, reverse=True):
-            if 0 <= index - 1 < len(group_ids):
-                group = group_ids.pop(index - 1)
-                if group not in whitelist_groups:
-                    whitelist_groups.append(group)
-                    whitelisted_groups.append(group)
-        
-        save_data()
-        save_whitelist()
+
+        for group in take_by_indices(group_ids, indices):
+            group_index.pop(group["id"], None)
+            if group["id"] not in whitelist_index:
+                whitelist_groups.append(group)
+                whitelist_index[group["id"]] = group
+                whitelisted_groups.append(group)
+
+        save_data("groups", "whitelist")
         
         if whitelisted_groups:
             response = "\n".join([f"Whitelisted: {group['name']} (ID: {group['id']})" for group in whitelisted_groups])
@@ -455,23 +2027,22 @@ async def whitelisting_groups(event):
         await event.edit(f"Error whitelisting groups: {e}")
     print("Whitelisted multiple groups.")
 
-@client.on(events.NewMessage(pattern=r"\.restore ([\d,-]+)"))
+@command(".restore", r"([\d,-]+)")
 async def restore_groups(event):
     """Restore multiple groups by indices from whitelist to main group list."""
     indices = event.pattern_match.group(1)
     try:
         indices = parse_indices(indices)
         restored_groups = []
-        
-        for index in sorted(indices, reverse=True):
-            if 0 <= index - 1 < len(whitelist_groups):
-                group = whitelist_groups.pop(index - 1)
-                if group not in group_ids:
-                    group_ids.append(group)
-                    restored_groups.append(group)
-        
-        save_data()
-        save_whitelist()
+
+        for group in take_by_indices(whitelist_groups, indices):
+            whitelist_index.pop(group["id"], None)
+            if group["id"] not in group_index:
+                group_ids.append(group)
+                group_index[group["id"]] = group
+                restored_groups.append(group)
+
+        save_data("groups", "whitelist")
         
         if restored_groups:
             response = "\n".join([f"Restored: {group['name']} (ID: {group['id']})" for group in restored_groups])
@@ -482,30 +2053,150 @@ async def restore_groups(event):
         await event.edit(f"Error restoring groups: {e}")
     print("Restored multiple groups.")
 
-@client.on(events.NewMessage(pattern=r"\.whitelistlist"))
+@command(".whitelistlist")
 async def view_whitelist(event):
     """List all groups in the whitelist."""
     if whitelist_groups:
-        response = "\n".join([f"{i + 1}. {group['name']} (ID: {group['id']})" for i, group in enumerate(whitelist_groups)])
-        await event.edit(f"Whitelisted Groups:\n{response}")
+        await send_listing(event, "Whitelisted Groups:", whitelist_groups, format_group, listing_mode(event), filename="whitelist.txt")
     else:
         await event.edit("No groups in the whitelist.")
     print("Listed all whitelisted groups.")
 
-@client.on(events.NewMessage(pattern=r"\.jeda_sesi (\d+)"))
+@command(".export")
+async def export_store(event):
+    """Export the SQLite store back to the JSON files."""
+    if not isinstance(store, SqliteStore):
+        await event.edit("JSON backend is active; the JSON files are already up to date.")
+        return
+    try:
+        exported = await store.export()
+        await event.edit(f"Exported {', '.join(exported) or 'nothing'} from {DB_FILE} to JSON.")
+    except Exception as e:
+        await event.edit(f"Failed to export store: {e}")
+
+@command(".quarantine")
+async def view_quarantine(event):
+    """List quarantined groups, or release all of them with `.quarantine clear`."""
+    if event.raw_text.split()[1:] == ["clear"]:
+        released = len(quarantine)
+        quarantine.clear()
+        save_data("quarantine")
+        await event.edit(f"Released {released} group(s) from quarantine.")
+        return
+
+    now = time.time()
+    active = [(chat_id, entry) for chat_id, entry in quarantine.items() if entry["until"] > now]
+    if active:
+        response = "\n".join([
+            f"{i + 1}. {entry['name']} (ID: {chat_id}) - {entry['error']}, "
+            f"{int(entry['until'] - now) // 60}m left, strike {entry['strikes']}"
+            for i, (chat_id, entry) in enumerate(active)
+        ])
+        await event.edit(f"Quarantined Groups:\n{response}")
+    else:
+        await event.edit("No groups in quarantine.")
+    print("Listed quarantined groups.")
+
+@command(".jeda_sesi", r"(\d+)")
 async def modify_break_delay(event):
     """Handle setting the break delay."""
     hours = event.pattern_match.group(1)
     response = jeda_sesi(hours)
     await event.edit(response)
 
-@client.on(events.NewMessage(pattern=r"\.status$"))
+@command(".status")
 async def view_status(event):
     """Handle viewing the bot's status."""
     response = get_status()
     await event.edit(response)
 
-@client.on(events.NewMessage(pattern=r"\.daftar"))
+async def send_report(event, text, filename, summary):
+    """Edit the command message with a short summary and attach the full report as a document."""
+    buffer = io.BytesIO(text.encode())
+    buffer.name = filename
+    await event.edit(summary[:MESSAGE_LIMIT])
+    await event.respond(file=buffer)
+
+@command(".bench")
+async def handle_bench(event):
+    """`.bench crypto`: AES-IGE throughput of every available backend and the crypto CPU cost at current traffic."""
+    args = event.raw_text.split()[1:]
+    if args != ["crypto"]:
+        await event.edit("Usage: .bench crypto")
+        return
+    await event.edit("Benchmarking AES-IGE backends...")
+    # Di thread supaya backend pure-Python tidak menahan event loop terlalu lama
+    results = await asyncio.to_thread(benchmark, available_backends())
+    uptime = max(time.time() - START_TIME, 1)
+    traffic = crypto_stats["bytes"] / uptime
+    lines = [
+        f"Active: {crypto_backend} (Telethon default: {telethon_default()})",
+        f"Traffic so far: {crypto_stats['bytes'] / (1024 * 1024):.1f} MB in {crypto_stats['calls']} packets, "
+        f"{format_seconds(crypto_stats['seconds'])} CPU ({crypto_stats['seconds'] / uptime:.3%} of one core)",
+        "",
+    ]
+    for name, sizes in results.items():
+        marker = " [active]" if name == crypto_backend else ""
+        lines.append(f"{name}{marker}")
+        for size, (encrypt, decrypt) in sizes.items():
+            lines.append(f"  {format_size(size):>6}: encrypt {format_rate(encrypt)}, decrypt {format_rate(decrypt)}")
+        # Perkiraan beban CPU pada traffic rata-rata saat ini (payload 4 KB)
+        encrypt, decrypt = sizes.get(4096, next(iter(sizes.values())))
+        lines.append(f"  at current traffic: ~{traffic * 2 / (encrypt + decrypt):.3%} of one core")
+    log_action("BENCH", f"Crypto benchmark: {', '.join(results)}", "SUCCESS")
+    await event.edit("\n".join(lines))
+
+@command(".profile")
+async def handle_profile(event):
+    """Profile the live event loop with cProfile for N seconds (default 10) and send the report."""
+    global profiling_active
+    args = event.raw_text.split()[1:]
+    if args and not args[0].isdigit():
+        await event.edit("Usage: .profile [seconds]")
+        return
+    seconds = min(max(int(args[0]) if args else 10, 1), 300)
+    if profiling_active:
+        await event.edit("A profile is already running.")
+        return
+    profiling_active = True
+    try:
+        await event.edit(f"Profiling the event loop for {seconds}s...")
+        report, top = await profile_loop(seconds)
+    finally:
+        profiling_active = False
+    await send_report(event, report, "profile.txt", f"Profile ({seconds}s), top by own time:\n" + "\n".join(top))
+
+@command(".mem")
+async def handle_memory(event):
+    """tracemalloc report; the first call starts tracing, `.mem reset` takes a new baseline, `.mem stop` ends it."""
+    action = (event.raw_text.split()[1:] or [""])[0]
+    if action == "stop":
+        memory_tracker.stop()
+        await event.edit("Memory tracing stopped.")
+        return
+    if action == "reset" or memory_tracker.baseline is None:
+        memory_tracker.start()
+        await event.edit("Memory tracing started; run .mem again later to see what grew since now.")
+        return
+    report = memory_tracker.report()
+    await send_report(event, report, "memory.txt", report.split("\n")[0])
+
+@command(".tasks")
+async def handle_tasks(event):
+    """List asyncio tasks (jobs and Telethon internals) with their stacks."""
+    names = {job["task"]: f"[job #{job['id']} {job['kind']}]" for job in jobs.values()}
+    if task is not None:
+        names[task] = "[send]"
+    if forward_task is not None:
+        names[forward_task] = "[autoforward]"
+    lines = [task_summary(item, names) for item in sorted(asyncio.all_tasks(), key=lambda item: item.get_name())]
+    stalls = [f"{stall['duration']:.2f}s in {stall['where']}" for stall in watchdog.stalls]
+    summary = f"{len(lines)} task(s):\n" + "\n".join(lines)
+    if stalls:
+        summary += "\n\nRecent loop stalls:\n" + "\n".join(stalls[-5:])
+    await send_report(event, dump_tasks(names), "tasks.txt", summary)
+
+@command(".daftar")
 async def list_events(event):
     commands = [
         
@@ -513,18 +2204,33 @@ async def list_events(event):
         "<b>Restart bot</b> -> <code>.restart</code>\n"
         "Merestart bot untuk menerapkan perubahan atau mengatasi masalah.",
 
+        "<b>Reload tanpa restart</b> -> <code>.reload</code>\n"
+        "Membaca ulang .env (DELAY_MIN, DELAY_MAX, BREAK_DELAY), data grup/pesan/whitelist dan modul PLUGINS tanpa memutus koneksi. Bisa dibatasi: <code>.reload config</code>, <code>.reload data</code>, <code>.reload plugins</code>.",
+
         "<b>Status</b> -> <code>.status</code>\n"
         "Mengetahui Status terkini dari bot",
 
+        "<b>Benchmark crypto</b> -> <code>.bench crypto</code>\n"
+        "Mengukur kecepatan enkripsi MTProto (AES-IGE) untuk setiap backend yang tersedia (cryptg, libcrypto, cryptography, bawaan Telethon) dan perkiraan beban CPU-nya. Backend dipilih lewat <code>CRYPTO_BACKEND</code> di .env.",
+
+        "<b>Profiling</b> -> <code>.profile <detik></code>\n"
+        "Menjalankan cProfile pada event loop selama beberapa detik dan mengirim hasilnya sebagai dokumen. <code>.mem</code> untuk snapshot memori (tracemalloc), <code>.tasks</code> untuk daftar task asyncio beserta stack-nya.",
+
+        "<b>Export data</b> -> <code>.export</code>\n"
+        "Mengekspor data dari backend SQLite ke file JSON (groups, messages, whitelist, stats).",
+
         "<blockquote>𝙋𝙀𝙍𝙄𝙉𝙏𝘼𝙃 𝙂𝙍𝙐𝙋</blockquote>\n"
         "<b>Melihat daftar grup</b> -> <code>.grup</code>\n"
-        "Menampilkan semua grup yang ada di daftar grup saat ini.",
+        "Menampilkan grup di daftar grup saat ini per halaman (<code>.grup 2</code>). <code>.grup all</code> mengirim semua halaman, <code>.grup file</code> mengirim daftar sebagai dokumen. Berlaku juga untuk <code>.grupall</code>, <code>.whitelistlist</code> dan <code>.pesan</code>.",
+
+        "<b>Sinkron semua grup</b> -> <code>.grupall</code>\n"
+        "Menambahkan grup baru dari akun ke daftar dan menandai grup yang sudah ditinggalkan, tanpa mengubah urutan dan whitelist. <code>.grupall refresh</code> untuk membaca ulang semua dialog.",
 
         "<b>Menambahkan group dengan ID</b> -> <code>.addgroupid <group_id></code>\n"
         "Digunakan untuk menambahkan grup ke dalam daftar grup berdasarkan ID grup.",
 
         "<b>Menambahkan group dengan nama</b> -> <code>.addgroup <group_name></code>\n"
-        "Menambahkan grup ke dalam daftar dengan mencocokkan nama grup di akun Telegram.",
+        "Menambahkan grup ke dalam daftar dengan mencocokkan nama grup di akun Telegram (awalan nama juga bisa; jika ada beberapa yang cocok, kandidat ditampilkan).",
 
         "<b>Whitelist grup</b> -> <code>.whitelist <nomor></code>\n"
         "Memindahkan grup tertentu dari daftar grup ke daftar whitelist.",
@@ -538,12 +2244,21 @@ async def list_events(event):
         "<b>Menghapus grup berdasarkan nomor urut</b> -> <code>.hapus <nomor></code>\n"
         "Menghapus grup dari daftar berdasarkan urutan dalam daftar grup.",
 
+        "<b>Cek kesehatan grup</b> -> <code>.cekgrup</code>\n"
+        "Memeriksa semua grup sekaligus (keanggotaan, izin kirim, channel broadcast, slow mode) dan menandai grup yang tidak bisa dikirimi agar dilewati. Dijalankan otomatis sebelum setiap putaran.",
+
+        "<b>Jadwal per grup</b> -> <code>.jadwal <nomor> interval <menit></code>\n"
+        "Mengatur jarak minimal antar posting untuk grup tertentu. <code>.jadwal <nomor> quiet 22-6</code> untuk jam tenang (tidak dikirimi), <code>.jadwal <nomor> reset</code> untuk menghapus keduanya.",
+
+        "<b>Melihat karantina grup</b> -> <code>.quarantine</code>\n"
+        "Menampilkan grup yang sementara dilewati karena tidak bisa dikirimi pesan. <code>.quarantine clear</code> untuk melepas semuanya.",
+
         "<blockquote>𝙋𝙀𝙍𝙄𝙉𝙏𝘼𝙃 𝙋𝙀𝙎𝘼𝙉</blockquote>\n"
         "<b>Menambahkan pesan baru</b> -> <code>.tambahpesan</code> (reply pesan)\n"
         "Menambahkan pesan baru ke dalam daftar pesan. Gunakan perintah ini dengan me-reply pesan yang ingin ditambahkan.",
 
         "<b>Melihat daftar pesan</b> -> <code>.pesan</code>\n"
-        "Menampilkan semua pesan yang tersimpan di daftar pesan.",
+        "Menampilkan pesan yang tersimpan per halaman dengan preview yang dipotong (<code>.pesan 2</code>, <code>.pesan file</code> untuk teks lengkap).",
 
         "<b>Memilih pesan untuk dikirim</b> -> <code>.selectmessage <nomor></code>\n"
         "Memilih pesan berdasarkan nomor urut di daftar pesan untuk digunakan saat pengiriman otomatis.",
@@ -562,7 +2277,13 @@ async def list_events(event):
         "Memulai forward pesan otomatis ke semua grup di daftar grup. Gunakan dengan me-reply pesan yang ingin diforward.",
 
         "<b>Menghentikan forward otomatis</b> -> <code>.stopforward</code>\n"
-        "Menghentikan forward pesan otomatis yang sedang berjalan.",
+        "Menghentikan forward pesan otomatis (dan forward satu kali) yang sedang berjalan.",
+
+        "<b>Daftar job</b> -> <code>.jobs</code>\n"
+        "Menampilkan job yang sedang berjalan beserta progres dan kesehatannya (restart, error terakhir, macet). Job yang crash dijalankan ulang otomatis dari checkpoint.",
+
+        "<b>Membatalkan job</b> -> <code>.cancel <id></code>\n"
+        "Menghentikan job tertentu berdasarkan nomor job.",
 
         "<b>Set Break Time</b> -> <code>.jeda_sesi</code>\n"
         "Mengatur jeda <i>break time</i>"
@@ -575,7 +2296,64 @@ async def list_events(event):
 
     
 # Main Function
+async def reconnect():
+    """Reconnect with capped backoff after Telethon gave up on its own retries."""
+    delay = JOB_BACKOFF_BASE
+    while not client.is_connected():
+        log_action("CONNECTION", f"Disconnected; reconnecting in {delay}s", "ERROR")
+        await asyncio.sleep(delay)
+        try:
+            await client.connect()
+        except Exception as e:
+            log_action("CONNECTION", f"Reconnect failed: {e}", "ERROR")
+        delay = min(delay * 2, JOB_BACKOFF_MAX)
+    log_action("CONNECTION", "Reconnected", "SUCCESS")
+
+async def connect_client():
+    await client.connect()
+    mark_startup("connected")
+
+async def after_startup():
+    """Everything not needed to handle commands; runs once the update loop is live."""
+    mark_startup("ready")
+    log_action("STARTUP", f"Ready to handle commands: {format_startup()}", "SUCCESS")
+    load_plugins()
+
+    # Lanjutkan job yang terputus oleh restart/crash
+    await resume_jobs()
+
+    asyncio.create_task(watch_jobs())
+    asyncio.create_task(monitor_loop_lag(metrics))
+    watchdog.start()
+    if WATCH_INTERVAL > 0:
+        asyncio.create_task(watch_config())
+    if METRICS_PORT:
+        try:
+            await serve_metrics(metrics, METRICS_HOST, METRICS_PORT)
+        except OSError as e:
+            log_action("METRICS", f"Failed to start metrics endpoint on port {METRICS_PORT}: {e}", "ERROR")
+
+    # Index dialog dimuat dari disk; crawl penuh hanya jika belum ada atau sudah basi
+    asyncio.create_task(ensure_dialog_index())
+
+    # Kirim pesan log ke Saved Messages setelah restart ("me" tidak butuh get_me)
+    notice = "Restart berhasil."
+    if RESTARTED_AT:
+        notice = f"Restart berhasil (downtime {format_seconds(startup_times['ready'] + START_TIME - RESTARTED_AT)})."
+    try:
+        await client.send_message("me", notice)
+    except Exception as e:
+        log_action("STARTUP", f"Failed to send restart notice: {e}", "ERROR")
+
+    # Self-check crypto: ukur backend aktif pada payload khas, tanpa menahan loop
+    crypto_throughput.update((await asyncio.to_thread(benchmark, crypto_active, (4096,), 0.05))[crypto_backend])
+    encrypt, decrypt = crypto_throughput[4096]
+    log_action("CRYPTO", f"AES-IGE backend {crypto_backend}: encrypt {format_rate(encrypt)}, decrypt {format_rate(decrypt)} (4 KB)", "INFO")
+
 async def main():
+    mark_startup("loaded")
+    # Handshake ke Telegram berjalan bersamaan dengan memuat data lokal di thread terpisah
+    await asyncio.gather(connect_client(), load_startup_data())
     if not await client.is_user_authorized():
         await client.send_code_request(PHONE)
         try:
@@ -594,17 +2372,18 @@ async def main():
  ╚═════╝ ╚══════╝╚══════╝╚═╝  ╚═╝╚═════╝  ╚═════╝    ╚═╝   
                                                            """)
     print("Created By: https://t.me/laksitoadi02")
-    
-    # Dapatkan ID pengguna Anda
-    me = await client.get_me()
-    user_id = me.id
-    
-    # Kirim pesan log ke Saved Messages setelah restart
-    await client.send_message(user_id, "Restart berhasil.")
-    
-    await client.run_until_disconnected()
+
+    # Dijalankan begitu run_until_disconnected menyerahkan kontrol ke loop
+    asyncio.create_task(after_startup())
+    try:
+        # Job tetap hidup selama koneksi putus; supervisor menjalankannya ulang setelah reconnect
+        while True:
+            await client.run_until_disconnected()
+            await reconnect()
+    finally:
+        store.flush_now()
+        session.flush()
 
 # Run the client
 if __name__ == "__main__":
-    client.start()
     client.loop.run_until_complete(main())